@@ -0,0 +1,189 @@
+from utils.startup import mark
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import queue
+import sys
+from datetime import datetime
+from dotenv import load_dotenv
+
+# run without the GUI, e.g.
+# python cli.py run              process every file in DATA_PATH once
+# python cli.py watch            keep processing files as they arrive in DATA_PATH
+# python cli.py extract a.pdf    print the extracted data, no files are moved
+
+
+def load_environment():
+    """Load the .env file next to the script or executable, if there is one."""
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+
+    env_path = os.path.join(base_path, '.env')
+    if os.path.exists(env_path):
+        load_dotenv(env_path)
+
+def get_folders(args):
+    """Folders from the command line, falling back to the .env values."""
+    folders = {
+        "data": args.data or os.getenv("DATA_PATH", ""),
+        "success": args.success or os.getenv("SUCCESS_PATH", ""),
+        "failed": args.failed or os.getenv("FAILED_PATH", ""),
+        "backup": args.backup or os.getenv("BACKUP_PATH", ""),
+        "log": args.log or os.getenv("LOG_PATH", ""),
+    }
+    missing = [name for name, path in folders.items() if not path]
+    if missing:
+        sys.exit(f"Folders not set: {', '.join(missing)}. Set them in .env or on the command line.")
+    return folders
+
+def list_data_files(data_folder):
+    """Split the files in the data folder into (pdf_files, other_files)."""
+    pdf_files = []
+    other_files = []
+    with os.scandir(data_folder) as entries:
+        for entry in entries:
+            if entry.is_file():
+                if entry.name.endswith('.pdf'):
+                    pdf_files.append(entry.path)
+                else:
+                    other_files.append(entry.path)
+    return sorted(pdf_files), sorted(other_files)
+
+def process_folder(folders, executor, poppler_path):
+    """Process every file currently in the data folder. Returns the number of files handled."""
+    pdf_files, other_files = list_data_files(folders["data"])
+    return process_files(pdf_files, other_files, folders, executor, poppler_path)
+
+def process_files(pdf_files, other_files, folders, executor, poppler_path):
+    """Extract and move the given files. Returns the number of files handled."""
+    from utils.file import reject_non_pdf
+    from utils.pipeline import process_pdf, commit_result
+    from utils.journal import get_job_journal
+
+    log_file = os.path.join(folders["log"], f"{datetime.now().strftime('%Y-%m-%d')}_log.txt")
+
+    for file_path in other_files:
+        try:
+            print(reject_non_pdf(file_path, folders["failed"], log_file))
+        except Exception as e:
+            print(f"Error handling file {file_path}: {e}")
+
+    get_job_journal().queue(pdf_files)
+    futures = [executor.submit(process_pdf, pdf_path, poppler_path) for pdf_path in pdf_files]
+    for future in concurrent.futures.as_completed(futures):
+        result = future.result()
+        try:
+            commit_result(result, folders["success"], folders["failed"], folders["backup"], log_file)
+        except Exception as e:
+            print(f"Error moving {result['pdf_path']}: {e}")
+            continue
+        mark("first_file")
+        status = "Success" if result["status"] else "Failed"
+        print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {status}: {os.path.basename(result['pdf_path'])} {result['error_message']}".rstrip())
+
+    return len(pdf_files) + len(other_files)
+
+def resume(folders):
+    """Finish the commits an interrupted run left, the files it did not extract are still in the data folder."""
+    from utils.pipeline import resume_jobs
+
+    log_file = os.path.join(folders["log"], f"{datetime.now().strftime('%Y-%m-%d')}_log.txt")
+    pending = resume_jobs(folders["success"], folders["failed"], folders["backup"], log_file)
+    if pending:
+        print(f"{len(pending)} file(s) of an interrupted run are processed again.")
+
+def run(args):
+    from utils.convert import get_poppler_path
+    from utils.file import get_worker_count
+    from utils.log import worker_logging
+
+    folders = get_folders(args)
+    workers = args.workers or get_worker_count()
+    poppler_path = get_poppler_path()
+    resume(folders)
+
+    initializer, initargs = worker_logging()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        if args.command == "run":
+            count = process_folder(folders, executor, poppler_path)
+            print(f"Processed {count} file(s).")
+            return
+
+        from utils.watcher import FolderWatcher
+
+        # the watcher reports from its own thread, files are processed here
+        arrived = queue.Queue()
+        watcher = FolderWatcher(folders["data"], arrived.put, poll_interval=args.interval)
+        mode = watcher.start()
+        how = f"polling every {args.interval} s" if mode == "poll" else "file events"
+        print(f"Watching {folders['data']} ({how}), press Ctrl+C to stop.")
+        try:
+            while True:
+                try:
+                    paths = arrived.get(timeout=1)
+                except queue.Empty:
+                    continue
+                process_files(
+                    [path for path in paths if path.endswith('.pdf')],
+                    [path for path in paths if not path.endswith('.pdf')],
+                    folders, executor, poppler_path,
+                )
+        except KeyboardInterrupt:
+            watcher.stop()
+            print("Stopped.")
+
+def extract(args):
+    from utils.pipeline import process_pdf
+
+    for pdf_path in args.files:
+        result = process_pdf(pdf_path)
+        print(json.dumps(result, ensure_ascii=False, default=str))
+
+def export(args):
+    from utils.result_log import export_result_rows, result_folder
+
+    day = args.date or datetime.now().strftime("%Y-%m-%d")
+    output = args.output or f"result_log_{day}.csv"
+    count = export_result_rows(result_folder, day, output)
+    print(f"Exported {count} result(s) of {day} to {output}.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rename scanned PDFs from their OCR header without the GUI.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("run", "process the data folder once"), ("watch", "keep processing new files in the data folder")):
+        command = subparsers.add_parser(name, help=help_text)
+        command.add_argument("--data", help="data folder (DATA_PATH)")
+        command.add_argument("--success", help="success folder (SUCCESS_PATH)")
+        command.add_argument("--failed", help="failed folder (FAILED_PATH)")
+        command.add_argument("--backup", help="backup folder (BACKUP_PATH)")
+        command.add_argument("--log", help="log folder (LOG_PATH)")
+        command.add_argument("--workers", type=int, default=0, help="worker processes, default from CPU and memory")
+        if name == "watch":
+            command.add_argument("--interval", type=float, default=5, help="seconds between folder checks when polling (network shares or no watchdog)")
+        command.set_defaults(handler=run)
+
+    command = subparsers.add_parser("extract", help="print the extracted data of PDFs as JSON lines, files are not moved")
+    command.add_argument("files", nargs="+")
+    command.set_defaults(handler=extract)
+
+    command = subparsers.add_parser("export", help="write the results of a day as CSV")
+    command.add_argument("--date", help="day as YYYY-MM-DD, default today")
+    command.add_argument("--output", help="CSV file, default result_log_<date>.csv")
+    command.set_defaults(handler=export)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    # .env must be loaded before the utils modules read their settings
+    load_environment()
+    from utils.log import setup_logging
+    setup_logging()
+    main()
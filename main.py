@@ -1,16 +1,22 @@
+from utils.startup import mark
 import sys, traceback
+import multiprocessing
+import importlib
 from PyQt6.QtWidgets import QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QPushButton, QMessageBox, QSplashScreen, QLabel
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QMovie
 from qt_material import apply_stylesheet
-from tabs.status_tab import StatusTab
-from tabs.config_tab import ConfigTab
-from tabs.result_tab import ResultsTab
-from tabs.version_tab import VersionTab
 import os
-import time
 from dotenv import load_dotenv
 
+# (title, module, class), tabs other than the first are built when first opened
+TABS = [
+    ("Status Monitor", "tabs.status_tab", "StatusTab"),
+    ("Result", "tabs.result_tab", "ResultsTab"),
+    ("Configuration", "tabs.config_tab", "ConfigTab"),
+    ("Version", "tabs.version_tab", "VersionTab"),
+]
+
 # os.environ.clear()
 
 # run command below to compile .exe
@@ -30,16 +36,12 @@ class MainWindow(QMainWindow):
         # Create the tab widget
         self.tabs = QTabWidget()
 
-        # Add tabs
-        self.status_tab = StatusTab()
-        self.config_tab = ConfigTab()
-        self.result_tab = ResultsTab()
-        self.version_tab = VersionTab()
-
-        self.tabs.addTab(self.status_tab, "Status Monitor")
-        self.tabs.addTab(self.result_tab, "Result")
-        self.tabs.addTab(self.config_tab, "Configuration")
-        self.tabs.addTab(self.version_tab, "Version")
+        # Add tabs, empty placeholders until they are opened
+        self.built_tabs = {}
+        for title, _, _ in TABS:
+            self.tabs.addTab(QWidget(), title)
+        self.build_tab(0)
+        self.tabs.currentChanged.connect(self.build_tab)
         self.layout.addWidget(self.tabs)
 
         self.quit_button = QPushButton("Quit")
@@ -49,6 +51,25 @@ class MainWindow(QMainWindow):
         container.setLayout(self.layout)
         self.setCentralWidget(container)
 
+    def build_tab(self, index):
+        """Import and create the tab at index the first time it is shown."""
+        if index < 0 or index in self.built_tabs:
+            return
+
+        title, module_name, class_name = TABS[index]
+        tab_class = getattr(importlib.import_module(module_name), class_name)
+        tab = tab_class()
+        self.built_tabs[index] = tab
+
+        # swap the placeholder without firing currentChanged again
+        self.tabs.blockSignals(True)
+        placeholder = self.tabs.widget(index)
+        self.tabs.removeTab(index)
+        self.tabs.insertTab(index, tab, title)
+        self.tabs.setCurrentIndex(index)
+        self.tabs.blockSignals(False)
+        placeholder.deleteLater()
+
     def keyPressEvent(self, a0):
         if a0.key() == Qt.Key.Key_Q:
             QApplication.quit()
@@ -57,6 +78,7 @@ class MainWindow(QMainWindow):
     
     def showEvent(self, event):
         super().showEvent(event)
+        mark("first_window")
         # Close the splash screen when the main window is displayed
         if self.splash_screen:
             self.splash_screen.close()
@@ -139,17 +161,24 @@ class SplashScreen(QLabel):
 
 
 if __name__ == "__main__":
+    # needed for the OCR worker processes in the packaged .exe
+    multiprocessing.freeze_support()
+    mark("imports")
+
     app = QApplication(sys.argv)
 
     gif_path = "asset/loading.gif"  
     splash = SplashScreen(gif_path, message="Loading OCR Application...")
     splash.show()
-
-    time.sleep(1)
+    # paint the splash now, the window is built right after
+    app.processEvents()
 
     sys.excepthook = handle_global_error
 
     load_environment()
+    # after the .env, LOG_LEVEL is read from it
+    from utils.log import setup_logging
+    setup_logging()
 
     apply_stylesheet(app, theme="dark_lightgreen.xml")
 
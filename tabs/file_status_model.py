@@ -0,0 +1,159 @@
+from datetime import datetime
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+
+
+def human_readable_size(size):
+    """Convert file size to a human-readable format."""
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size < 1024:
+            return f"{size:.2f} {unit}"
+        size /= 1024
+    return f"{size:.2f} TB"
+
+
+class FileStatusModel(QAbstractTableModel):
+    """
+    Files of the data folder for the Status table, one row per file name.
+
+    Rows are looked up through a name -> row dict, so updating the status of a
+    finished file does not walk the table. Inserts and removals are applied in
+    batches, removals scheduled with remove_later are collected and flushed
+    together.
+    """
+
+    HEADERS = ["File Name", "Date Added", "Size", "Status"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # entries are the DirectoryIndex dicts: size, mtime, added, status
+        self.entries = {}
+        self.names = []
+        self.rows = {}
+
+        self.removal_due = {}
+        self.removal_timer = QTimer(self)
+        self.removal_timer.setSingleShot(True)
+        self.removal_timer.timeout.connect(self.flush_removals)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.names)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if role == Qt.ItemDataRole.TextAlignmentRole and index.column() > 0:
+            return Qt.AlignmentFlag.AlignCenter
+
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        name = self.names[index.row()]
+        entry = self.entries[name]
+        column = index.column()
+        if column == 0:
+            return name
+        if column == 1:
+            return datetime.fromtimestamp(entry["added"]).strftime("%d/%m/%Y")
+        if column == 2:
+            return human_readable_size(entry["size"])
+        return entry["status"]
+
+    def add_files(self, entries):
+        """
+        Append {name: entry} in one insert. A name that is still listed, e.g. a
+        finished file waiting for removal that arrived again, gets the new entry.
+        """
+        listed = [name for name in entries if name in self.rows]
+        for name in listed:
+            self.entries[name] = entries[name]
+            self.removal_due.pop(name, None)
+        self.refresh_files(listed)
+
+        new_names = [name for name in entries if name not in self.rows]
+        if not new_names:
+            return
+
+        first = len(self.names)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_names) - 1)
+        for name in new_names:
+            self.rows[name] = len(self.names)
+            self.names.append(name)
+            self.entries[name] = entries[name]
+        self.endInsertRows()
+
+    def remove_files(self, names):
+        """Remove the rows of these names, one removal per contiguous block of rows."""
+        rows = sorted((self.rows[name] for name in names if name in self.rows), reverse=True)
+        if not rows:
+            return
+
+        # group descending row numbers into blocks, e.g. [9, 8, 5] -> (8, 9), (5, 5)
+        blocks = []
+        for row in rows:
+            if blocks and blocks[-1][0] == row + 1:
+                blocks[-1][0] = row
+            else:
+                blocks.append([row, row])
+
+        for first, last in blocks:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for name in self.names[first:last + 1]:
+                del self.entries[name]
+                self.removal_due.pop(name, None)
+            del self.names[first:last + 1]
+            self.endRemoveRows()
+
+        self.rows = {name: row for row, name in enumerate(self.names)}
+
+    def remove_later(self, name, delay_ms=3000):
+        """Remove the row after delay_ms, together with other rows that are due by then."""
+        if name not in self.rows:
+            return
+        self.removal_due[name] = datetime.now().timestamp() + delay_ms / 1000
+        if not self.removal_timer.isActive():
+            self.removal_timer.start(delay_ms)
+
+    def flush_removals(self):
+        now = datetime.now().timestamp()
+        due = [name for name, due_at in self.removal_due.items() if due_at <= now]
+        self.remove_files(due)
+        for name in due:
+            self.removal_due.pop(name, None)
+
+        if self.removal_due:
+            wait = min(self.removal_due.values()) - now
+            self.removal_timer.start(max(0, int(wait * 1000)))
+
+    def refresh_files(self, names):
+        """Repaint the rows of files whose entry changed."""
+        for name in names:
+            row = self.rows.get(name)
+            if row is not None:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+
+    def set_status(self, name, status):
+        """Change the status of one file, returns False if it is not listed."""
+        row = self.rows.get(name)
+        if row is None:
+            return False
+        self.entries[name]["status"] = status
+        cell = self.index(row, 3)
+        self.dataChanged.emit(cell, cell)
+        return True
+
+    def clear(self):
+        self.beginResetModel()
+        self.entries.clear()
+        self.names.clear()
+        self.rows.clear()
+        self.removal_due.clear()
+        self.endResetModel()
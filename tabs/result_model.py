@@ -0,0 +1,78 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+# rows added to the view each time it scrolls near the end
+FETCH_SIZE = 500
+
+
+class ResultLogModel(QAbstractTableModel):
+    """
+    Rows of a result log for the Results table. The rows are not copied, the
+    view is given FETCH_SIZE rows at a time through canFetchMore/fetchMore as
+    it scrolls, so switching to a day with many rows costs one model reset.
+    """
+
+    HEADERS = ["Original Name", "New Name", "Status", "Error Cause"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.loaded = 0
+        self.message = None
+
+    def set_rows(self, rows, message=None):
+        """Show rows, or message in a single row when there are none."""
+        self.beginResetModel()
+        self.rows = rows
+        self.loaded = min(FETCH_SIZE, len(rows))
+        self.message = None if rows else (message or "No data available.")
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return 1 if self.message else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(FETCH_SIZE, len(self.rows) - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        column = index.column()
+        if role == Qt.ItemDataRole.TextAlignmentRole and column == 2:
+            return Qt.AlignmentFlag.AlignCenter
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        if self.message:
+            return self.message if column == 0 else None
+
+        # file_name, new_file_name, extracted_data, status, error_message, date_processed
+        row = self.rows[index.row()]
+        if column == 0:
+            return row[0]
+        if column == 1:
+            # Handle empty new_file_name for failed entries
+            return row[1] if len(row) > 1 and row[1] else "N/A"
+        if column == 2:
+            return row[3] if len(row) > 3 else ""
+        return row[4] if len(row) > 4 else ""
@@ -1,15 +1,17 @@
-import csv
 import os
 import shutil
+import sqlite3
 from datetime import datetime
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QHBoxLayout, QHeaderView, QLabel, QDateEdit, QMessageBox, QFileDialog
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTableView, QPushButton, QHBoxLayout, QHeaderView, QLabel, QDateEdit, QMessageBox, QFileDialog
 from PyQt6.QtCore import QDate, Qt
 from pathlib import Path
+from utils.result_log import get_result_rows, export_result_rows, result_folder
+from utils.store import get_result_store
+from tabs.result_model import ResultLogModel
 
 
 home_dir = Path.home()
 image_folder = home_dir / "OCRHeader" / "image"
-result_folder = home_dir / "OCRHeader" / "result_log"
 
 class ResultsTab(QWidget):
     def __init__(self, results_folder=result_folder):
@@ -20,7 +22,9 @@ class ResultsTab(QWidget):
         self.layout = QVBoxLayout()
 
         # Table Widget
-        self.table = QTableWidget()
+        self.model = ResultLogModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.layout.addWidget(self.table)
 
         header = self.table.horizontalHeader()
@@ -98,24 +102,20 @@ class ResultsTab(QWidget):
 
     def load_results_log(self, filter_by=None):
         """Load data from today's results log and optionally filter by status."""
-        log_file_path = self.get_log_file_path(selected_date=self.date_picker.date().toString("yyyy-MM-dd"))
+        selected_date = self.date_picker.date().toString("yyyy-MM-dd")
         try:
-            with open(log_file_path, "r", encoding="utf-8", errors="replace") as file:
-                reader = csv.reader(file)
-
-                header = next(reader, None)
-
-                data = list(reader)
-
-                # Filter data if needed
-                if filter_by:
-                    data = [row for row in data if row[3] == filter_by]  
+            data = get_result_rows(self.results_folder, selected_date, status=filter_by)
+            has_results = bool(data) or bool(get_result_rows(self.results_folder, selected_date))
+        except (OSError, sqlite3.Error) as e:
+            self.update_table([], message=f"Cannot read the results: {e}")
+            return
 
-                if not data:  # If filtered or loaded data is empty
-                    self.update_table([], message="No data found for the selected filter.")
-                else:
-                    self.update_table(data)
-        except FileNotFoundError:
+        if data:
+            self.update_table(data)
+        elif has_results:
+            # If filtered or loaded data is empty
+            self.update_table([], message="No data found for the selected filter.")
+        else:
             self.update_table([], message="No data found for the selected date.")
 
     def load_results_log_for_date(self):
@@ -123,11 +123,13 @@ class ResultsTab(QWidget):
         self.load_results_log()
 
     def download_log_file(self):
-        """Download the log file for the selected date."""
+        """Export the results of the selected date as CSV, older days are copied from their CSV log and the day of the upgrade has both."""
         selected_date = self.date_picker.date().toString("yyyy-MM-dd")
         log_file_path = self.get_log_file_path(selected_date=selected_date)
 
-        if not os.path.exists(log_file_path):
+        store = get_result_store()
+        in_store = store.last_id(selected_date) > 0
+        if not in_store and not os.path.exists(log_file_path):
             QMessageBox.warning(self, "Error", f"No log file found for {selected_date}.")
             return
 
@@ -137,7 +139,10 @@ class ResultsTab(QWidget):
 
         if save_path:
             try:
-                shutil.copy(log_file_path, save_path)
+                if in_store:
+                    export_result_rows(self.results_folder, selected_date, save_path)
+                else:
+                    shutil.copy(log_file_path, save_path)
                 QMessageBox.information(self, "Success", f"Log file saved to {save_path}.")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to save the log file: {e}")
@@ -145,48 +150,7 @@ class ResultsTab(QWidget):
 
     def update_table(self, data, message=None):
         """Update the table with the given data or show a message if no data is available."""
-        self.table.setRowCount(0)  
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Original Name", "New Name", "Status", "Error Cause"])
-
+        self.table.clearSpans()
+        self.model.set_rows(data, message=message)
         if not data:
-            # If no data, show the message in the first row
-            self.table.setRowCount(1)
-            self.table.setItem(0, 0, QTableWidgetItem(message if message else "No data available."))
             self.table.setSpan(0, 0, 1, 4)  # Span across all columns
-            return
-        
-        for row_data in data:
-            # Handle empty new_file_name for failed entries
-            file_name = row_data[0]
-            new_file_name = row_data[1] if row_data[1] else "N/A"  
-            status = row_data[3]
-            error_message = row_data[4] if len(row_data) > 4 else ""
-
-            row_number = self.table.rowCount()
-            self.table.insertRow(row_number)
-
-            # Add file name
-            file_item = QTableWidgetItem(file_name)
-            # file_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            # file_item.setFlags(file_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  
-            self.table.setItem(row_number, 0, file_item)
-
-            # Add new file name (use "N/A" if empty)
-            new_file_item = QTableWidgetItem(new_file_name)
-            # new_file_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            # new_file_item.setFlags(new_file_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  
-            self.table.setItem(row_number, 1, new_file_item)
-
-            # Add status
-            status_item = QTableWidgetItem(status)
-            status_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            status_item.setFlags(status_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  
-            self.table.setItem(row_number, 2, status_item)
-
-            # Add error cause
-            error_item = QTableWidgetItem(error_message)
-            # error_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            # error_item.setFlags(error_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  
-            self.table.setItem(row_number, 3, error_item)
-
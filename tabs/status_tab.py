@@ -1,18 +1,35 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QLabel, QMessageBox, QTextEdit, QHeaderView, QHBoxLayout
-from PyQt6.QtCore import Qt, QThread, QTimer
-from utils.file import  process_file, get_datetime, log_result_to_csv, add_log_message, get_dynamic_batch_size
+import logging
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTableView, QPushButton, QLabel, QMessageBox, QPlainTextEdit, QHeaderView, QHBoxLayout
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
+from utils.file import  process_file, get_datetime, log_result, add_log_message, reject_non_pdf
+from utils.startup import mark
 
 import os
 from datetime import datetime
 from worker.ocrworker import OCRWorker
+from worker.watchworker import WatchWorker
+from utils.dirindex import DirectoryIndex
+from tabs.file_status_model import FileStatusModel
 import shutil
 import gc
 
+logger = logging.getLogger(__name__)
+
 
 MAX_FILES   = int(os.getenv('MAX_FILES', 500))
 RECOMMENDED_FILES   = int(os.getenv('RECOMMENDED_FILES', 300))
+# lines kept in the log area, the log file has all of them
+LOG_VIEW_LINES      = int(os.getenv('LOG_VIEW_LINES', 1000))
+
+# log messages are added to the log area together every this many ms
+LOG_FLUSH_MS = 150
 
 class StatusTab(QWidget):
+    # files for the OCR worker, delivered on its thread
+    files_queued = pyqtSignal(list)
+    # interrupted jobs are committed again on the worker's thread
+    resume_requested = pyqtSignal()
+
     def __init__(self):
         super().__init__()
 
@@ -24,19 +41,21 @@ class StatusTab(QWidget):
 
         self.log_file = os.path.join(self.log_folder, f"{datetime.now().strftime('%Y-%m-%d')}_log.txt")
 
-        self.pdf_files = []
+        # files handed to the OCR worker and not completed yet
+        self.queued_files = set()
+        # files shown in the table, updated incrementally by refresh_file_list
+        self.index = DirectoryIndex(self.data_folder)
 
         self.auto_ocr_running = False
         self.processing_ocr = False
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.auto_ocr_check)
+        # auto OCR: files are queued as the watcher reports them
+        self.watch_worker = None
 
         self.layout = QVBoxLayout()
 
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["File Name", "Date Added", "Size", "Status"])
-        self.table.setRowCount(0)  
+        self.model = FileStatusModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.layout.addWidget(self.table)
         
         header = self.table.horizontalHeader()
@@ -86,11 +105,23 @@ class StatusTab(QWidget):
         self.status_label = QLabel("Status: Ready")
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
-        self.log_area = QTextEdit()
+        self.log_area = QPlainTextEdit()
         self.log_area.setReadOnly(True)
         self.log_area.setFixedHeight(200)
+        self.log_area.setMaximumBlockCount(LOG_VIEW_LINES)
+
+        # messages waiting for the next flush_log
+        self.pending_log = []
+        self.log_timer = QTimer(self)
+        self.log_timer.setSingleShot(True)
+        self.log_timer.timeout.connect(self.flush_log)
+
+        # stage queue depths, only filled in staged mode
+        self.queue_label = QLabel("")
+        self.queue_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
         self.layout.addWidget(self.status_label)
+        self.layout.addWidget(self.queue_label)
         self.layout.addLayout(self.button_layout)
         self.layout.addWidget(self.log_area)
         self.setLayout(self.layout)
@@ -101,9 +132,12 @@ class StatusTab(QWidget):
 
         self.validate_paths()
 
-        # self.add_mock_data()
         self.load_files()
 
+        if not self.validate_folders():
+            # after the window is shown
+            QTimer.singleShot(0, self.resume_interrupted)
+
     def validate_folders(self):
         missing_paths = []
 
@@ -130,10 +164,10 @@ class StatusTab(QWidget):
             self.auto_ocr_button.setEnabled(False)
             # Update status and log area
             self.status_label.setText("Status: Not Ready")
-            self.log_area.append("The following paths are not set:")
+            self.log_message("The following paths are not set:")
             for path in missing_paths:
-                self.log_area.append(f"- {path}")
-            self.log_area.append("Please configure all paths before starting OCR.")
+                self.log_message(f"- {path}")
+            self.log_message("Please configure all paths before starting OCR.")
         else:
             # Enable OCR buttons
             self.auto_ocr_button.setEnabled(True)
@@ -146,63 +180,69 @@ class StatusTab(QWidget):
         if not self.auto_ocr_running:
             self.auto_ocr_running = True
             self.auto_ocr_button.setText('Stop Auto OCR')
-            self.log_area.append("Auto OCR started. Monitoring folder...")
 
             self.start_button.setEnabled(False)
             self.stop_button.setEnabled(False)
 
-            self.timer.start(5000)
+            self.watch_worker = WatchWorker(self.data_folder)
+            self.watch_worker.files_arrived.connect(self.on_files_arrived)
+            mode = self.watch_worker.start()
+            self.log_message(f"Auto OCR started. Monitoring folder ({'polling' if mode == 'poll' else 'file events'})...")
         else:
             self.auto_ocr_running = False
             self.processing_ocr = False
             self.auto_ocr_button.setText('Auto OCR')
-            self.log_area.append("Auto OCR stopped.")
+            self.log_message("Auto OCR stopped.")
 
             self.start_button.setEnabled(True)
             self.stop_button.setEnabled(True)
 
-            self.stop_ongoing_ocr()
+            if self.watch_worker:
+                self.watch_worker.stop()
+                self.watch_worker = None
 
-            self.timer.stop()
+            self.stop_ongoing_ocr()
 
     def stop_ongoing_ocr(self):
         """Stop the currently running OCR process."""
         self.processing_ocr = False
-        if self.thread and self.thread.isRunning():
-            self.log_area.append("Stopping ongoing OCR process...")
-            self.worker.stop()  # Custom stop method in OCRWorker
-            self.thread.quit()  # Gracefully stop the thread
-            self.thread.wait()
-            self.thread = None
-            self.worker = None
-            self.log_area.append("OCR process stopped.")
+        if self.worker:
+            self.log_message("Stopping ongoing OCR process...")
+            self.stop_worker()
+            self.log_message("OCR process stopped.")
         
         # Reset processing flag
         self.processing_ocr = False
         self.status_label.setText("Status: Ready")
 
 
-    def auto_ocr_check(self):
-        """Check the data folder for new PDF files periodically."""
-        if self.processing_ocr:
-            # self.log_area.append("OCR process is running. Skipping this check...")
-            return 
+    def on_files_arrived(self, file_paths):
+        """Queue files reported by the folder watcher, starting OCR if it is idle."""
+        if not self.auto_ocr_running:
+            return
 
-        self.log_area.append(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}-Checking for new files...")
-        pdf_files = [os.path.join(self.data_folder, f) for f in os.listdir(self.data_folder) if f.endswith('.pdf')]
+        pdf_files = [f for f in file_paths if f.endswith('.pdf')]
+        for non_pdf in file_paths:
+            if non_pdf.endswith('.pdf'):
+                continue
+            try:
+                self.log_message(reject_non_pdf(non_pdf, self.failed_folder, self.log_file))
+            except Exception as e:
+                self.log_message(f"Error handling file {non_pdf}: {str(e)}")
 
-        if pdf_files and len(pdf_files) > 0:
-            self.refresh_button.click()
-            self.log_area.append(f"Found {len(pdf_files)} PDF file(s). Starting OCR...")
-            self.start_ocr()  
-        else:
-            self.log_area.append("No new files found.")
+        self.refresh_file_list()
+        if not pdf_files:
+            return
+
+        self.log_message(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Found {len(pdf_files)} new PDF file(s).")
+        # joins the running queue, or starts it
+        self.run_ocr(pdf_files)
 
     def view_log_file(self):
         """Open the current day's log file."""
         log_folder = os.getenv("LOG_PATH", "")
         if not log_folder:
-            print("Log folder path not set in .env.")
+            logger.warning("Log folder path not set in .env.")
             return
 
         log_file_name = f"{datetime.now().strftime('%Y-%m-%d')}_log.txt"
@@ -215,9 +255,9 @@ class StatusTab(QWidget):
                 if os.name == "nt":  # Windows
                     os.startfile(log_file_path)
             except Exception as e:
-                print(f"Failed to open log file: {e}")
+                logger.error("Failed to open log file: %s", e)
         else:
-            print(f"Log file not found: {log_file_path}")
+            logger.warning("Log file not found: %s", log_file_path)
             msg_box = QMessageBox()
             msg_box.setIcon(QMessageBox.Icon.Warning)
             msg_box.setText(f"Log file for today does not exist: {log_file_name}")
@@ -226,148 +266,126 @@ class StatusTab(QWidget):
             msg_box.exec()
             return
 
-    def batch_files(self, files, batch_size):
-        print('in barch file: ', batch_size)
-        for i in range(0, len(files), batch_size):
-            yield files[i:i+batch_size]
-        
+    def resume_interrupted(self):
+        """Finish what the last run left unfinished on the worker's thread, see OCRWorker.resume."""
+        if self.worker is None:
+            self.start_worker()
+        self.resume_requested.emit()
+
+    def on_resumed(self, pending):
+        """Interrupted commits are done, queue the files that still need OCR."""
+        self.refresh_file_list()
+        pending = [pdf_path for pdf_path in pending if os.path.exists(pdf_path)]
+        if pending:
+            self.log_message(f"Resuming {len(pending)} file(s) of an interrupted run.")
+            # files queued meanwhile are skipped by run_ocr
+            self.run_ocr(pending)
+
     def start_ocr(self):
         # check for duplicate calls
-        print('process status: ', self.processing_ocr)
+        logger.debug("process status: %s", self.processing_ocr)
         if self.processing_ocr:
             return 
-        
-        self.processing_ocr = True
-        self.log_area.append("Starting OCR process...")
 
-        self.status_label.setText("Status: Processing OCR...")
-        
+        self.log_message("Starting OCR process...")
 
-        all_files = [os.path.join(self.data_folder, f) for f in os.listdir(self.data_folder)]
-        self.pdf_files = [os.path.join(self.data_folder, f) for f in os.listdir(self.data_folder) if f.endswith('.pdf')]
+        # one listing of the data folder
+        with os.scandir(self.data_folder) as entries:
+            all_files = [entry.path for entry in entries]
+        pdf_files = [f for f in all_files if f.endswith('.pdf')]
         non_pdf_files = [f for f in all_files if not f.endswith('.pdf')]
 
         for non_pdf in non_pdf_files:
             try:
                 # Move to error folder
-                dest_path = os.path.join(self.failed_folder, os.path.basename(non_pdf))
-                # backup_destpath = os.path.join(self.backup_folder, os.path.basename(non_pdf))
-                # shutil.copy(non_pdf, backup_destpath)
-                shutil.move(non_pdf, dest_path)
-
-                # Log error to text and CSV
-                error_message = f"Non-PDF file moved: {os.path.basename(non_pdf)}"
-                self.log_area.append(error_message)
-
-                add_log_message(error_message, self.log_file)
-
-                extracted_data = {"document_id": "", "error_message": error_message, "date":"", "item_name":""}
-                log_result_to_csv(non_pdf, extracted_data, False, error_message)
+                error_message = reject_non_pdf(non_pdf, self.failed_folder, self.log_file)
+                self.log_message(error_message)
 
             except Exception as e:
-                self.log_area.append(f"Error handling file {non_pdf}: {str(e)}")
+                self.log_message(f"Error handling file {non_pdf}: {str(e)}")
 
         if len(non_pdf_files) != 0:
             self.refresh_button.click()
 
-        if not self.pdf_files:
-            self.log_area.append("No files to process.")
+        if not pdf_files:
+            self.log_message("No files to process.")
             return
-        
-
-        batch_size_dynamic = get_dynamic_batch_size()
-        print("-----------------------------------")
-        print("batch size: ", batch_size_dynamic)
-        print("-----------------------------------")
-        
-        self.batch_files(self.pdf_files, batch_size_dynamic)
-        
-        self.batches = list(self.batch_files(self.pdf_files, batch_size_dynamic))
-        print("total batches", len(self.batches))
-        self.current_batch = 0
-        self.process_batch()
-
-        self.start_button.setEnabled(False)
-        self.stop_button.setEnabled(True)
 
-    def process_batch(self):
-        if self.current_batch >= len(self.batches):
-            self.log_area.append("All files processed.")
+        self.run_ocr(pdf_files)
 
-            self.status_label.setText("Status: Ready")
-
-            self.processing_ocr = False
+    def run_ocr(self, pdf_files):
+        """Queue the files on the OCR worker, starting it on the first call."""
+        pdf_files = [pdf_path for pdf_path in pdf_files if pdf_path not in self.queued_files]
+        if not pdf_files:
+            return
+        self.queued_files.update(pdf_files)
 
-            self.worker = None
-            self.thread = None
-            gc.collect()
+        self.processing_ocr = True
+        self.status_label.setText("Status: Processing OCR...")
+        if self.worker is None:
+            self.start_worker()
+        self.log_message(f"Queued {len(pdf_files)} file(s).")
+        self.files_queued.emit(pdf_files)
 
-            self.start_button.setEnabled(True)
-            self.stop_button.setEnabled(False)
-            return
+        self.start_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
 
-        batch = self.batches[self.current_batch]
-        self.log_area.append(f"Processing batch {self.current_batch + 1}/{len(self.batches)}...")
-        
+    def start_worker(self):
+        """One worker and thread for the whole run, files are added with files_queued."""
         self.thread = QThread()
-        self.worker = OCRWorker(batch, self.data_folder, self.success_folder, self.failed_folder, self.backup_folder, self.log_folder)
+        self.worker = OCRWorker(self.data_folder, self.success_folder, self.failed_folder, self.backup_folder, self.log_folder)
         self.worker.moveToThread(self.thread)
 
         self.thread.started.connect(self.worker.run)
-        self.worker.progress.connect(self.log_area.append)
+        self.files_queued.connect(self.worker.add_files)
+        self.resume_requested.connect(self.worker.resume)
+        self.worker.resumed.connect(self.on_resumed)
+        self.worker.progress.connect(self.log_message)
         self.worker.completed.connect(self.on_file_completed)
-        self.worker.batch_completed.connect(self.on_batch_completed)
+        self.worker.idle.connect(self.on_worker_idle)
+        self.worker.queue_depths.connect(self.show_queue_depths)
         self.thread.finished.connect(self.thread.deleteLater)
 
         self.thread.start()
 
-    def on_batch_completed(self):
-        self.log_area.append(f"Batch {self.current_batch + 1} completed.")
+    def on_worker_idle(self):
+        """Every queued file is done, the worker waits for more."""
+        if self.queued_files:
+            # files queued after the worker counted its last one
+            return
+        self.log_message("All files processed.")
+        self.status_label.setText("Status: Ready")
+        self.processing_ocr = False
+        gc.collect()
 
-        if self.thread:
-            if self.thread.isRunning():
-                self.thread.quit()
-                self.thread.wait()
+        if not self.auto_ocr_running:
+            self.start_button.setEnabled(True)
+            self.stop_button.setEnabled(False)
 
-        gc.collect()
-        self.current_batch += 1
-        self.process_batch()
+    def stop_worker(self):
+        """Stop the worker and its thread, the next run_ocr starts new ones."""
+        if self.worker:
+            self.files_queued.disconnect(self.worker.add_files)
+            self.resume_requested.disconnect(self.worker.resume)
+            self.worker.stop()
+        if self.thread and self.thread.isRunning():
+            self.thread.quit()
+            self.thread.wait(3000)
+        self.worker = None
+        self.thread = None
+        self.queued_files.clear()
 
     def stop_ocr(self):
         """Stop the OCR process."""
         self.processing_ocr = False
-        self.log_area.append("Stopping OCR process...")
+        self.log_message("Stopping OCR process...")
         self.status_label.setText("Status: Stopping OCR process...")
         # self.timer.stop()
 
-        if self.worker:
-            # self.worker.stop()
-            self.worker._is_running = False
-            self.log_area.append("Worker flagged for stopping.")
-
-            if hasattr(self.worker, "thread_pool"):
-                self.worker.thread_pool.clear()
-                self.log_area.append("Thread pool cleared.")
-
-            # # Ensure thread pool tasks are gracefully completed
-            # if hasattr(self.worker, "thread_pool") and self.worker.thread_pool.activeThreadCount() > 0:
-            #     self.log_area.append("Waiting for tasks to complete or stop...")
-            #     self.worker.thread_pool.waitForDone()
-
-        if self.thread:
-            if self.thread.isRunning():
-                self.thread.quit()
-                self.thread.wait(3000)
-            
-        self.worker = None
-        self.thread = None
-
-        self.batches = []
-        self.current_batch = 0
-
+        # files not started yet are dropped, files being moved finish
+        self.stop_worker()
 
-
-        self.log_area.append("OCR process stopped.")
+        self.log_message("OCR process stopped.")
 
         self.status_label.setText("Status: Ready")
 
@@ -376,93 +394,44 @@ class StatusTab(QWidget):
 
     def on_file_completed(self, file_name, status):
         """Update the status of a processed file."""
+        mark("first_file")
+        self.queued_files.discard(file_name)
         datetime_str = get_datetime()
-        self.log_area.append(f"{datetime_str} - Completed: {file_name} - {'Success' if status else 'Failed'}")
+        self.log_message(f"{datetime_str} - Completed: {file_name} - {'Success' if status else 'Failed'}")
 
         # Update the table or other UI elements if necessary
-        for row in range(self.table.rowCount()):
-            if self.table.item(row, 0).text() == os.path.basename(file_name):
-                status_item = QTableWidgetItem("Success" if status else "Failed")
-                status_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                self.table.setItem(row, 3, status_item)
-                QTimer.singleShot(3000, lambda r=row: self.table.removeRow(r))
-                break
+        name = os.path.basename(file_name)
+        if self.model.set_status(name, "Success" if status else "Failed"):
+            self.model.remove_later(name)
+        self.index.remove(name)
 
-        if not os.listdir(self.data_folder):
-            self.table.setRowCount(0)
+    def show_queue_depths(self, depths):
+        """Show how many files wait in and are processed by each stage."""
+        text = " | ".join(f"{name}: {depth['queued']} waiting, {depth['busy']} busy" for name, depth in depths.items())
+        self.queue_label.setText(f"Queues - {text}")
 
     def log_message(self, message):
-        """Append a log message to the log area"""
-        self.log_area.append(message)
+        """Queue a log message, it is shown in the log area with the next flush_log."""
+        self.pending_log.append(message)
+        if not self.log_timer.isActive():
+            self.log_timer.start(LOG_FLUSH_MS)
+
+    def flush_log(self):
+        """Add the queued messages to the log area in one update."""
+        if not self.pending_log:
+            return
+        # only the lines the area keeps are worth adding
+        lines = self.pending_log[-LOG_VIEW_LINES:]
+        self.pending_log = []
+        self.log_area.appendPlainText("\n".join(lines))
 
     def load_files(self):
         """Scan the data folder and populate the table with file details"""
         if not os.path.exists(self.data_folder) and self.data_folder != "":
             self.log_message(f"Data folder '{self.data_folder}' does not exist.")
 
-        is_over_limit = self.check_folder_limit()
-        if is_over_limit:
-            return
+        self.refresh_file_list()
 
-        try:
-            self.table.setRowCount(0)
-            for file_name in os.listdir(self.data_folder):
-                file_path = os.path.join(self.data_folder, file_name)
-                # self.log_message(f"Found {file_path}")
-
-                if os.path.isfile(file_path):
-                    file_size = os.path.getsize(file_path)
-                    file_size_str = self.human_readable_size(file_size)
-                    file_date_added = self.get_date_added(file_path)
-                    self.add_file_status(file_name, file_date_added, file_size_str, "Pending")
-            
-            self.check_table_rows()
-
-        except Exception as e:
-            self.log_message(f"Error scanning folder '{self.data_folder}': {e}")
-
-    def add_file_status(self, file_name, added_date, file_size, processed_status):
-        """Add a new file status to the table."""
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-
-        file_item = QTableWidgetItem(file_name)
-        file_item.setFlags(file_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  
-        self.table.setItem(row, 0, file_item)
-
-        date_item = QTableWidgetItem(added_date)
-        date_item.setFlags(date_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  
-        date_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.table.setItem(row, 1, date_item)
-
-        size_item = QTableWidgetItem(file_size)
-        size_item.setFlags(size_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  
-        size_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.table.setItem(row, 2, size_item)
-
-        status_item = QTableWidgetItem(processed_status)
-        status_item.setFlags(status_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  
-        status_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.table.setItem(row, 3, status_item)
-
-    def human_readable_size(self, size):
-        """Convert file size to a human-readable format."""
-        for unit in ["B", "KB", "MB", "GB", "TB"]:
-            if size < 1024:
-                return f"{size:.2f} {unit}"
-            size /= 1024
-        return f"{size:.2f} TB"
-
-    def get_date_added(self, file_path):
-        """Get the file creation or modification date as dd/mm/yyyy."""
-        try:
-            if os.name == 'nt':  # For Windows
-                timestamp = os.path.getctime(file_path)  
-            return datetime.fromtimestamp(timestamp).strftime("%d/%m/%Y")
-        except Exception as e:
-            self.log_message(f"Error getting date for '{file_path}': {e}")
-            return "Unknown"
-        
     def open_success_folder(self):
         # Logic to open success folder
         success_folder = os.getenv("SUCCESS_PATH", "")
@@ -471,40 +440,48 @@ class StatusTab(QWidget):
                 os.startfile(success_folder) 
                 # os.system(f'explorer "{folder_path}"')
         else:
-            self.log_area.append("Success folder path does not exist.")
+            self.log_message("Success folder path does not exist.")
         
     def refresh_file_list(self):
-        """Refresh the list of files displayed in the table."""
-        self.table.setRowCount(0)  # Clear the table
-
-        is_over_limit = self.check_folder_limit()
-        if is_over_limit:
-            return 
-
+        """Apply the files added to and removed from the data folder since the last refresh."""
         # Check if data folder exists
         if not os.path.exists(self.data_folder):
+            self.index.clear()
+            self.model.clear()
             self.check_table_rows()
-            self.log_area.append("Data folder does not exist.")
+            self.log_message("Data folder does not exist.")
             return
 
-        # Populate table with files
-        for file_name in os.listdir(self.data_folder):
-            file_path = os.path.join(self.data_folder, file_name)
-            if os.path.isfile(file_path):
-                file_size = os.path.getsize(file_path)
-                file_size_str = self.human_readable_size(file_size)
-                file_date_added = self.get_date_added(file_path)
-                self.add_file_status(file_name, file_date_added, file_size_str, "Pending")
+        previous_pdf_count = self.index.count('.pdf')
+        try:
+            added, removed, changed = self.index.scan()
+        except OSError as e:
+            self.log_message(f"Error scanning folder '{self.data_folder}': {e}")
+            return
+
+        is_over_limit = self.check_folder_limit(self.index.count('.pdf'), previous_pdf_count)
+        if is_over_limit:
+            # nothing is listed until the folder is below the limit
+            self.index.clear()
+            self.model.clear()
+            self.check_table_rows()
+            return
+
+        self.model.remove_files(removed)
+        self.model.refresh_files(changed)
+        # Populate table with new files
+        self.model.add_files({name: self.index[name] for name in added})
         
         self.check_table_rows()
-    
+
     def clear_log_area(self):
+        self.pending_log = []
         self.log_area.clear()
 
     def check_table_rows(self):
-        print("count: " , str(self.table.rowCount()))
+        logger.debug("count: %s", self.model.rowCount())
         """Enable or disable the Start OCR button based on table row count."""
-        if self.table.rowCount() == 0:
+        if self.model.rowCount() == 0:
             self.start_button.setEnabled(False)
             self.stop_button.setEnabled(False)
         else:
@@ -516,42 +493,28 @@ class StatusTab(QWidget):
                 self.start_button.setEnabled(True)
                 self.stop_button.setEnabled(True)
 
-    def add_mock_data(self):
-        """Add mock data to the table for testing."""
-        mock_data = [
-            ("file1.pdf", "08/12/2024", "2 MB", "Completed"),
-            ("file2.pdf", "08/12/2024", "1.5 MB", "In Progress"),
-            ("file3.pdf", "08/12/2024", "1 MB", "Pending..."),
-            ("file4.pdf", "08/12/2024", "500 kB", "Pending..."),
-        ]
-
-        for file_name, added_date, file_size, processed_status in mock_data:
-            self.add_file_status(file_name, added_date, file_size, processed_status)
-
-    def check_folder_limit(self):
+    def check_folder_limit(self, pdf_count, previous_pdf_count=0):
+        """
+        Warn about the number of PDF files in the data folder, True when it is above MAX_FILES.
+        The recommended limit is only reported when the count goes over it.
+        """
         # Check hard limit
-        try:
-            pdf_files = [os.path.join(self.data_folder, f) for f in os.listdir(self.data_folder) if f.endswith('.pdf')]
-            if len(pdf_files) > MAX_FILES:
-                QMessageBox.critical(
-                    self,
-                    "File Limit Exceeded",
-                    f"The folder contains too many PDF files ({len(pdf_files)}). "
-                    f"The maximum allowed is {MAX_FILES}. Please reduce the number of files and try again."
-                )
-                return True
-
-            # Check recommended limit
-            if len(pdf_files) > RECOMMENDED_FILES:
-                QMessageBox.warning(
-                    self,
-                    "Warning: Large Number of Files",
-                    f"The folder contains a large number of PDF files ({len(pdf_files)}). "
-                    f"We recommend processing fewer than {RECOMMENDED_FILES} files for better performance."
-                )
-
-            return False
-        except:
-            return False
-        
-
+        if pdf_count > MAX_FILES:
+            QMessageBox.critical(
+                self,
+                "File Limit Exceeded",
+                f"The folder contains too many PDF files ({pdf_count}). "
+                f"The maximum allowed is {MAX_FILES}. Please reduce the number of files and try again."
+            )
+            return True
+
+        # Check recommended limit
+        if pdf_count > RECOMMENDED_FILES >= previous_pdf_count:
+            QMessageBox.warning(
+                self,
+                "Warning: Large Number of Files",
+                f"The folder contains a large number of PDF files ({pdf_count}). "
+                f"We recommend processing fewer than {RECOMMENDED_FILES} files for better performance."
+            )
+
+        return False
@@ -0,0 +1,55 @@
+import os
+import random
+from difflib import get_close_matches
+
+from utils.format import MATCH_CUTOFF, ModelFolderIndex
+
+
+def close_match(name, folder_names, cutoff=MATCH_CUTOFF):
+    """What find_best_match returned before the folders were indexed."""
+    if name in folder_names:
+        return name
+    matches = get_close_matches(name, folder_names, n=1, cutoff=cutoff)
+    return matches[0] if matches else None
+
+
+def make_folders(folder_path, names):
+    for name in names:
+        os.makedirs(os.path.join(folder_path, name), exist_ok=True)
+
+
+def test_closest_finds_names_sharing_few_trigrams(tmp_path):
+    # ratio 0.8, but only one of the six trigrams of the name is shared
+    make_folders(tmp_path, ["2B--A"])
+    assert ModelFolderIndex().closest(str(tmp_path), "2--ZA") == close_match("2--ZA", ["2B--A"])
+
+
+def test_closest_matches_get_close_matches(tmp_path):
+    rng = random.Random(20)
+    alphabet = "AB2-zX"
+
+    def mutate(name):
+        chars = list(name)
+        for _ in range(rng.randint(0, 3)):
+            action = rng.choice("dis")
+            position = rng.randrange(len(chars) + 1)
+            if action == "i" or not chars:
+                chars.insert(position, rng.choice(alphabet))
+            elif position < len(chars):
+                if action == "d":
+                    del chars[position]
+                else:
+                    chars[position] = rng.choice(alphabet)
+        return "".join(chars) or "A"
+
+    for round_number in range(30):
+        folder_path = tmp_path / str(round_number)
+        base = "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 14)))
+        names = sorted({mutate(base) for _ in range(40)})
+        make_folders(folder_path, names)
+
+        index = ModelFolderIndex()
+        for _ in range(40):
+            name = mutate(rng.choice(names))
+            for cutoff in (0.6, MATCH_CUTOFF, 0.9):
+                assert index.closest(str(folder_path), name, cutoff) == close_match(name, names, cutoff), (name, cutoff)
@@ -0,0 +1,33 @@
+import os
+
+from utils.names import NameReserver
+
+
+def test_reserve_versions(tmp_path):
+    reserver = NameReserver()
+    path = str(tmp_path / "a.pdf")
+    assert reserver.reserve(path) == path
+    assert reserver.reserve(path) == str(tmp_path / "a_1.pdf")
+    assert reserver.reserve(str(tmp_path / "a_1.pdf")) == str(tmp_path / "a_2.pdf")
+    assert reserver.reserve(str(tmp_path / "a_1.pdf"), continue_version=False) == str(tmp_path / "a_1_1.pdf")
+
+
+def test_reserve_reuses_deleted_names(tmp_path):
+    reserver = NameReserver()
+    path = str(tmp_path / "a.pdf")
+    claimed = [reserver.reserve(path) for _ in range(3)]
+    assert claimed == [path, str(tmp_path / "a_1.pdf"), str(tmp_path / "a_2.pdf")]
+
+    # moved out by someone else, the folder is listed again
+    os.remove(claimed[1])
+    os.remove(claimed[2])
+    assert reserver.reserve(path) == str(tmp_path / "a_1.pdf")
+    assert reserver.reserve(path) == str(tmp_path / "a_2.pdf")
+
+
+def test_reserve_finds_files_added_by_others(tmp_path):
+    reserver = NameReserver()
+    path = str(tmp_path / "a.pdf")
+    assert reserver.reserve(path) == path
+    open(tmp_path / "a_1.pdf", "w").close()
+    assert reserver.reserve(path) == str(tmp_path / "a_2.pdf")
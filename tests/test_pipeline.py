@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+import utils.file
+import utils.journal
+import utils.store
+from utils.journal import JobJournal, COMMITTING
+from utils.pipeline import commit_result, resume_jobs
+
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils.journal, "job_journal", JobJournal(tmp_path / "jobs.db"))
+    monkeypatch.setattr(utils.store, "result_store", utils.store.ResultStore(tmp_path / "results.db"))
+    paths = {}
+    for name in ("data", "success", "failed", "backup", "log"):
+        paths[name] = str(tmp_path / name)
+        os.makedirs(paths[name])
+    paths["log_file"] = os.path.join(paths["log"], "log.txt")
+    return paths
+
+
+def make_pdf(folders, name, content):
+    pdf_path = os.path.join(folders["data"], name)
+    with open(pdf_path, "wb") as file:
+        file.write(content)
+    utils.journal.get_job_journal().queue([pdf_path])
+    return pdf_path
+
+
+def make_result(pdf_path):
+    extracted_data = {"item_name": "MODELX-AB-CDE", "document_id": "S-1234", "date": "05-Feb-25", "type": 1}
+    return {
+        "pdf_path": pdf_path, "extracted_data": extracted_data, "status": True, "doc_type": extracted_data,
+        "error_message": None, "exception": False, "cached": True, "timings": {},
+    }
+
+
+def commit(folders, result):
+    commit_result(result, folders["success"], folders["failed"], folders["backup"], folders["log_file"])
+
+
+def success_files(folders):
+    found = {}
+    for folder, _, names in os.walk(folders["success"]):
+        for name in names:
+            with open(os.path.join(folder, name), "rb") as file:
+                found[name] = file.read()
+    return found
+
+
+def test_resume_keeps_a_file_that_took_a_freed_name(folders, monkeypatch):
+    first = make_pdf(folders, "a.pdf", b"first")
+    second = make_pdf(folders, "b.pdf", b"second")
+
+    def failing_copy(src, dst):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(utils.file, "LINK_SUCCESS", 0)
+        patch.setattr(utils.file, "copy_file", failing_copy)
+        commit(folders, make_result(first))
+    assert os.path.exists(first)
+    assert success_files(folders) == {}
+
+    # the freed name goes to the next document
+    commit(folders, make_result(second))
+    assert list(success_files(folders).values()) == [b"second"]
+
+    resume_jobs(folders["success"], folders["failed"], folders["backup"], folders["log_file"])
+    assert sorted(success_files(folders).values()) == [b"first", b"second"]
+    assert not os.path.exists(first)
+
+
+def test_resume_removes_only_the_interrupted_success_file(folders):
+    pdf_path = make_pdf(folders, "a.pdf", b"first")
+    other = os.path.join(folders["success"], "other.pdf")
+    with open(other, "wb") as file:
+        file.write(b"someone else")
+
+    utils.journal.get_job_journal().set_state(pdf_path, COMMITTING, result=make_result(pdf_path), success_path=other)
+    resume_jobs(folders["success"], folders["failed"], folders["backup"], folders["log_file"])
+
+    with open(other, "rb") as file:
+        assert file.read() == b"someone else"
+    assert sorted(success_files(folders).values()) == [b"first", b"someone else"]
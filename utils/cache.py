@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+from threading import Lock
+
+# env
+RESULT_CACHE       = int(os.getenv('RESULT_CACHE', 1))
+CACHE_MAX_ENTRIES  = int(os.getenv('CACHE_MAX_ENTRIES', 20000))
+CACHE_MAX_AGE_DAYS = int(os.getenv('CACHE_MAX_AGE_DAYS', 90))
+
+home_dir = Path.home()
+cache_file = home_dir / "OCRHeader" / "cache.db"
+
+# evict old entries after this many writes
+EVICT_EVERY = 200
+
+result_cache = None
+result_cache_lock = Lock()
+
+
+def file_hash(file_path, chunk_size=1024 * 1024):
+    """SHA-256 of the file content, read in chunks so large PDFs are not loaded into memory."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Extraction results keyed by the content hash of the PDF, stored in SQLite.
+    Entries written by another pipeline version are ignored.
+    """
+
+    def __init__(self, path=cache_file, max_entries=CACHE_MAX_ENTRIES, max_age_days=CACHE_MAX_AGE_DAYS):
+        os.makedirs(Path(path).parent, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.lock = Lock()
+        self.writes = 0
+
+        # several worker processes share the file, WAL lets readers and a writer work together
+        self.connection = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                hash TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_used_at ON results (used_at)")
+        self.connection.commit()
+        self.evict()
+
+    def get(self, digest, version):
+        """Return the cached result for this hash and pipeline version, or None."""
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT result FROM results WHERE hash = ? AND version = ? AND created_at > ?",
+                (digest, version, now - self.max_age),
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE results SET used_at = ? WHERE hash = ?", (now, digest))
+            self.connection.commit()
+        return json.loads(row[0])
+
+    def put(self, digest, version, result):
+        """Store the result of a PDF."""
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results (hash, version, result, created_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (digest, version, json.dumps(result, ensure_ascii=False), now, now),
+            )
+            self.connection.commit()
+            self.writes += 1
+            should_evict = self.writes % EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Drop entries older than the maximum age, then the least recently used ones above the size limit."""
+        with self.lock:
+            self.connection.execute("DELETE FROM results WHERE created_at <= ?", (time.time() - self.max_age,))
+            self.connection.execute(
+                "DELETE FROM results WHERE hash IN (SELECT hash FROM results ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.connection.commit()
+
+
+def get_result_cache():
+    """The cache of this process, opened on first use. None when RESULT_CACHE is off."""
+    global result_cache
+    if not RESULT_CACHE:
+        return None
+    with result_cache_lock:
+        if result_cache is None:
+            result_cache = ResultCache()
+    return result_cache
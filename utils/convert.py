@@ -1,17 +1,110 @@
-from pdf2image import convert_from_path
+import logging
 import os
-import numpy as np
-import cv2
 import sys
-from PIL import Image
+import subprocess
+import concurrent.futures
+
+logger = logging.getLogger(__name__)
+
+# cv2, numpy and pdf2image are imported where they are used, so processes that
+# only move files (the GUI, the commit stage) do not load them
+
+# env
+RENDER_MODE   = os.getenv('RENDER_MODE', 'header')
+HEADER_HEIGHT = int(os.getenv('HEADER_HEIGHT', 1000))
+BASE_DPI      = 300
 
 def is_running_as_exe():
     """Detect if the application is running as a compiled .exe."""
     return getattr(sys, 'frozen', False)
 
+def get_poppler_path():
+    """Folder containing the poppler binaries, None means poppler is on PATH."""
+    if os.getenv('POPPLER_PATH'):
+        return os.getenv('POPPLER_PATH')
+    if is_running_as_exe():
+        return os.path.abspath('./binaries/poppler/bin')
+    if os.name == 'nt':
+        return 'C:/poppler-24.07.0/Library/bin'
+    return None
+
+def render_header(pdf_path, poppler_path=None, dpi=BASE_DPI, height=HEADER_HEIGHT, timeout=None):
+    """
+    Render only the top strip of page 1 and return it as a BGR array.
+
+    pdftoppm is called directly with a crop box, so poppler rasterizes just the
+    header and the pdfinfo call pdf2image makes before every render is skipped.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        poppler_path (str): Folder containing pdftoppm, or None to use PATH.
+        dpi (int): Render resolution.
+        height (int): Height of the header strip in pixels at 300 DPI.
+        timeout (float): Seconds to wait for poppler before giving up.
+
+    Returns:
+        np.ndarray: The rendered header (BGR).
+    """
+    command = os.path.join(poppler_path, 'pdftoppm') if poppler_path else 'pdftoppm'
+    crop_height = int(height * dpi / BASE_DPI)
+    # -W 0 keeps the full page width, the PPM image is written to stdout
+    args = [command, '-f', '1', '-l', '1', '-r', str(dpi),
+            '-x', '0', '-y', '0', '-W', '0', '-H', str(crop_height), str(pdf_path)]
+
+    startupinfo = None
+    if os.name == 'nt':
+        # hide the console window of pdftoppm on Windows
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo)
+    try:
+        data, error = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise TimeoutError(f"PDF to image conversion timed out for {pdf_path}")
+
+    if process.returncode != 0 or not data:
+        raise Exception(error.decode('utf-8', 'replace').strip() or f"pdftoppm failed for {pdf_path}")
+
+    import cv2
+    import numpy as np
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise Exception(f"Cannot decode rendered page of {pdf_path}")
+    return image
+
+def render_page(pdf_path, poppler_path=None, dpi=BASE_DPI, timeout=None):
+    """
+    Render page 1 of the PDF to a BGR array using the configured RENDER_MODE.
+    Raises TimeoutError when poppler takes longer than timeout seconds.
+    """
+    if RENDER_MODE == 'header':
+        return render_header(pdf_path, poppler_path, dpi=dpi, timeout=timeout)
+
+    import cv2
+    import numpy as np
+    from pdf2image import convert_from_path
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(convert_from_path, pdf_path, dpi=dpi, poppler_path=poppler_path, first_page=1, last_page=1)
+            images = future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        raise TimeoutError(f"PDF to image conversion timed out for {pdf_path}")
+
+    if not images:
+        raise Exception("No images generated from PDF")
+
+    image = cv2.cvtColor(np.array(images[0]), cv2.COLOR_RGB2BGR)
+    images[0].close()
+    return image
+
 def pdf_to_image(pdf_path, poppler_path, dpi=300, width=3600, height=1000):
     """Convert PDF to images.""" 
-    print(pdf_path, dpi, width, height)
+    from pdf2image import convert_from_path
+    logger.debug("pdf_to_image %s dpi=%s", pdf_path, dpi)
     images = convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path)
     return images
     # resized_images = []
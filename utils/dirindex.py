@@ -0,0 +1,82 @@
+import os
+
+
+class DirectoryIndex:
+    """
+    In-memory index of the files in one folder, name -> {'size', 'mtime', 'added', 'status'}.
+
+    scan() lists the folder once with os.scandir and returns only what changed
+    since the previous scan, so callers can update their view incrementally.
+    On Windows scandir returns the stat data with the listing, so a scan of
+    a network share is one directory read instead of one request per file.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.files = {}
+
+    def scan(self):
+        """
+        Bring the index up to date with the folder.
+
+        Returns:
+            tuple: (added, removed, changed) lists of file names. New files get
+            the status 'Pending', files whose size or mtime changed keep theirs.
+
+        Raises:
+            OSError: The folder cannot be listed.
+        """
+        added, changed = [], []
+        seen = set()
+
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    # removed while listing
+                    continue
+
+                name = entry.name
+                seen.add(name)
+                # st_ctime is the creation time on Windows
+                added_time = stat.st_ctime if os.name == 'nt' else stat.st_mtime
+                current = self.files.get(name)
+
+                if current is None:
+                    self.files[name] = {"size": stat.st_size, "mtime": stat.st_mtime, "added": added_time, "status": "Pending"}
+                    added.append(name)
+                elif (current["size"], current["mtime"]) != (stat.st_size, stat.st_mtime):
+                    current.update(size=stat.st_size, mtime=stat.st_mtime)
+                    changed.append(name)
+
+        removed = [name for name in self.files if name not in seen]
+        for name in removed:
+            del self.files[name]
+
+        return sorted(added), removed, changed
+
+    def set_status(self, name, status):
+        if name in self.files:
+            self.files[name]["status"] = status
+
+    def remove(self, name):
+        """Forget a file that was moved away, returns False if it was not indexed."""
+        return self.files.pop(name, None) is not None
+
+    def clear(self):
+        self.files.clear()
+
+    def count(self, suffix=None):
+        """Number of indexed files, only those ending with suffix if given."""
+        if suffix is None:
+            return len(self.files)
+        return sum(1 for name in self.files if name.endswith(suffix))
+
+    def __contains__(self, name):
+        return name in self.files
+
+    def __getitem__(self, name):
+        return self.files[name]
@@ -0,0 +1,133 @@
+import os
+import re
+import threading
+import numpy as np
+import pytesseract
+
+# tesserocr keeps Tesseract loaded in process, without it every call starts tesseract.exe
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# env
+OCR_LANG      = os.getenv('OCR_LANG', 'eng')
+TESSDATA_PATH = os.getenv('TESSDATA_PATH', os.path.abspath('./binaries/tesseract/tessdata'))
+
+tesseract_path = os.getenv('OCR_PATH', os.path.abspath('./binaries/tesseract/tesseract.exe'))
+if os.path.exists(tesseract_path):
+    pytesseract.pytesseract.tesseract_cmd = tesseract_path
+
+# one set of engines per worker thread, a Tesseract handle is not thread safe
+thread_engines = threading.local()
+
+
+def parse_config(config):
+    """
+    Split a tesseract command line config into (psm, oem, variables).
+    e.g. "--psm 6 --oem 1 -c preserve_interword_spaces=1"
+    """
+    psm_match = re.search(r"--psm\s+(\d+)", config)
+    oem_match = re.search(r"--oem\s+(\d+)", config)
+    psm = int(psm_match.group(1)) if psm_match else 3
+    oem = int(oem_match.group(1)) if oem_match else 3
+    variables = tuple(sorted(re.findall(r"-c\s+(\w+)=(\S+)", config)))
+    return psm, oem, variables
+
+def get_engine(oem=3, variables=()):
+    """
+    Return the warm Tesseract handle of the current thread for this OCR engine mode,
+    creating it on first use. Handles live as long as the thread.
+    """
+    engines = getattr(thread_engines, 'engines', None)
+    if engines is None:
+        engines = thread_engines.engines = {}
+
+    key = (oem, variables)
+    api = engines.get(key)
+    if api is None:
+        kwargs = {"lang": OCR_LANG, "oem": tesserocr.OEM(oem)}
+        if TESSDATA_PATH and os.path.isdir(TESSDATA_PATH):
+            kwargs["path"] = TESSDATA_PATH
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        for name, value in variables:
+            api.SetVariable(name, value)
+        engines[key] = api
+    return api
+
+def set_engine_image(api, image, psm):
+    """Hand a NumPy image to the engine without going through PIL."""
+    image = np.ascontiguousarray(image)
+    height, width = image.shape[:2]
+    bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+    api.SetPageSegMode(tesserocr.PSM(psm))
+    api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+
+def image_to_string(image, config=""):
+    """Drop-in for pytesseract.image_to_string using the thread's warm engine."""
+    if tesserocr is None:
+        return pytesseract.image_to_string(image, config=config)
+
+    if image.size == 0:
+        return ""
+
+    psm, oem, variables = parse_config(config)
+    api = get_engine(oem, variables)
+    try:
+        set_engine_image(api, image, psm)
+        return api.GetUTF8Text()
+    finally:
+        api.Clear()
+
+def image_to_data(image, config=""):
+    """
+    Drop-in for pytesseract.image_to_data(output_type=Output.DICT), word level only.
+
+    Returns:
+        dict: lists keyed by block_num, par_num, line_num, word_num, left, top,
+        width, height, conf and text.
+    """
+    if tesserocr is None:
+        return pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+
+    keys = ["level", "page_num", "block_num", "par_num", "line_num", "word_num", "left", "top", "width", "height", "conf", "text"]
+    data = {key: [] for key in keys}
+    if image.size == 0:
+        return data
+
+    psm, oem, variables = parse_config(config)
+    api = get_engine(oem, variables)
+    try:
+        set_engine_image(api, image, psm)
+        api.Recognize()
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+
+        level = tesserocr.RIL.WORD
+        block_num = par_num = line_num = word_num = 0
+        while True:
+            if iterator.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                block_num += 1
+                par_num = 0
+            if iterator.IsAtBeginningOf(tesserocr.RIL.PARA):
+                par_num += 1
+                line_num = 0
+            if iterator.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                line_num += 1
+                word_num = 0
+            word_num += 1
+
+            text = iterator.GetUTF8Text(level)
+            box = iterator.BoundingBox(level)
+            if text and box:
+                x1, y1, x2, y2 = box
+                row = [5, 1, block_num, par_num, line_num, word_num, x1, y1, x2 - x1, y2 - y1, iterator.Confidence(level), text]
+                for key, value in zip(keys, row):
+                    data[key].append(value)
+
+            if not iterator.Next(level):
+                break
+        return data
+    finally:
+        api.Clear()
@@ -1,55 +1,66 @@
+import errno
+import logging
 import os
 import shutil
-import psutil
+import threading
 from datetime import datetime
-from PIL import Image
-import csv
 from pathlib import Path
 import re
-from threading import Lock
-from utils.format import organize_files
+from utils.format import placement_path
+from utils.names import name_reserver
+from utils.store import get_result_store, result_record
+from utils.journal import get_job_journal, EXTRACTED, COMMITTING
+from utils.log import write_log_line
+
+logger = logging.getLogger(__name__)
 
 
 CROP_WIDTH   = int(os.getenv('CROP_WIDTH', 300))
+OCR_WORKERS  = int(os.getenv('OCR_WORKERS', 0))
+MEMORY_PER_WORKER = int(os.getenv('MEMORY_PER_WORKER', 200))
+SAVE_DEBUG_IMAGES = int(os.getenv('SAVE_DEBUG_IMAGES', 0))
+# on one volume the Success file is a hard link to the Backup file instead of
+# a copy; both names then share the content until one of them is rewritten
+LINK_SUCCESS = int(os.getenv('LINK_SUCCESS', 1))
 
 home_dir = Path.home()
 image_folder = home_dir / "OCRHeader" / "image"
-result_folder = home_dir / "OCRHeader" / "result_log"
 
-file_operation_lock = Lock()
+# folder -> st_dev, the volume it is on
+folder_volumes = {}
+
+image_folder_ready = False
 
 
 def add_log_message(message, log_file):
-    """Logs a message to the log file."""
-    with open(log_file, "a", encoding="utf-8", errors="replace") as log:
-        log.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}\n")
-
-
-def log_result_to_csv(file_path, extracted_data, status, error_message=None):
-    """Append OCR results to a CSV file."""
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    log_file_path = result_folder / f"result_log_{date_str}.csv"
-
-    log_entry = {
-        "file_name": os.path.basename(file_path),
-        "new_file_name": (
-            f"{sanitize_file_name(extracted_data.get('item_name', ''))}-"
-            f"{sanitize_file_name(extracted_data.get('document_id', ''))}-"
-            f"{sanitize_file_name(extracted_data.get('date', ''))}.pdf"
-            if extracted_data else "Unknown.pdf"
-        ),
-        "extracted_data": extracted_data if extracted_data else "",
-        "status": "Success" if status else "Failed",
-        "error_message": error_message if not status else "",
-        "date_processed": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    }
-
-    write_header = not os.path.exists(log_file_path)
-    with open(log_file_path, mode="a", newline="", encoding="utf-8") as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=log_entry.keys())
-        if write_header:
-            writer.writeheader()
-        writer.writerow(log_entry)
+    """Logs a message to the log file, written in the background by utils/log.py."""
+    write_log_line(log_file, message)
+    logger.debug("%s", message)
+
+
+def log_result(file_path, extracted_data, status, error_message=None, timings=None, dpi=None, cached=False):
+    """Queue the OCR result of a file for the result store, see utils/store.py."""
+    new_file_name = (
+        f"{sanitize_file_name(extracted_data.get('item_name', ''))}-"
+        f"{sanitize_file_name(extracted_data.get('document_id', ''))}-"
+        f"{sanitize_file_name(extracted_data.get('date', '') or '')}.pdf"
+        if extracted_data else "Unknown.pdf"
+    )
+    record = result_record(file_path, extracted_data, status, error_message, new_file_name, timings=timings, dpi=dpi, cached=cached)
+    get_result_store().add(record)
+
+def reject_non_pdf(file_path, failed_folder, log_file):
+    """Move a file that is not a PDF to the Failed folder and log it. Returns the log message."""
+    dest_path = os.path.join(failed_folder, os.path.basename(file_path))
+    shutil.move(file_path, dest_path)
+
+    # Log error to text and CSV
+    error_message = f"Non-PDF file moved: {os.path.basename(file_path)}"
+    add_log_message(error_message, log_file)
+
+    extracted_data = {"document_id": "", "error_message": error_message, "date":"", "item_name":""}
+    log_result(file_path, extracted_data, False, error_message)
+    return error_message
 
 def get_datetime():
     now = datetime.now()
@@ -104,67 +115,155 @@ def process_file(status, pdf_path, extracted_data, success_folder, failed_folder
     
     new_filename = sanitize_file_name(new_filename)
 
-    success_path = os.path.join(success_folder, get_unique_filename(success_folder, new_filename))
     fail_path = os.path.join(failed_folder, os.path.basename(pdf_path))
-    backup_path = os.path.join(backup_folder, get_unique_filename(backup_folder, os.path.basename(pdf_path)))
     
-    print("PDF: ", pdf_path)
-    print("New filename: ", new_filename)
+    logger.debug("PDF: %s, new filename: %s", pdf_path, new_filename)
 
 
     # print(failed_folder, os.path.basename(pdf_path), os.path.join(failed_folder, os.path.basename(pdf_path)))
-    with file_operation_lock:
-        try:
-            if status:
-                if os.path.exists(pdf_path):
-                    shutil.copy(pdf_path, success_path)
-                    # add_log_message(f"{datetime_str} - SUCCESS: {os.path.basename(pdf_path)} moved to Success folder. New file name is {new_filename}", log_file)
-                    if os.path.exists(success_path):
-                        organize_files(success_folder, doc_type=extracted_data)
-                        log_message = f"SUCCESS: {os.path.basename(os.path.basename(pdf_path))} moved to Success folder. New file name is {os.path.basename(success_path)}."
-                        add_log_message(log_message, log_file)
-                    else:
-                        add_log_message(f"ERROR: File {os.path.basename(pdf_path)} move to success failed.", log_file)
-            else:
-                if os.path.exists(pdf_path):
-                    shutil.move(pdf_path, fail_path)
-                    add_log_message(f"FAILED: {os.path.basename(pdf_path)} moved to Failed folder.", log_file)
-
-            if status and os.path.exists(pdf_path):
-                shutil.move(pdf_path, backup_path)
-                add_log_message(f"BACKUP: {os.path.basename(pdf_path)} copied to Backup folder.", log_file)
-    
-        except Exception as e:
-            # print(e)
+    journal = get_job_journal()
+    # no lock around the commit: names are claimed atomically (utils/names.py) and
+    # folders are created with exist_ok, so only commits into the same folder wait
+    # for each other, inside NameReserver
+    try:
+        if status:
+            if os.path.exists(pdf_path):
+                # straight into its model/date folder, the rest of the Success folder is left as it is;
+                # each path is saved before its placeholder is created, a restart removes the placeholder
+                success_path = placement_path(new_filename, success_folder, extracted_data,
+                                              claiming=lambda path: journal.set_state(pdf_path, EXTRACTED, success_path=path))
+                # a restart removes this file again if the commit does not finish
+                journal.set_state(pdf_path, COMMITTING, success_path=success_path)
+                try:
+                    if not (LINK_SUCCESS and same_volume(pdf_path, success_path) and link_file(pdf_path, success_path)):
+                        copy_file(pdf_path, success_path)
+                except Exception:
+                    # the name is free again and may go to another file, a restart must not remove it
+                    remove_placeholder(success_path)
+                    journal.release(pdf_path, EXTRACTED)
+                    raise
+                # add_log_message(f"{datetime_str} - SUCCESS: {os.path.basename(pdf_path)} moved to Success folder. New file name is {new_filename}", log_file)
+                if os.path.exists(success_path):
+                    log_message = f"SUCCESS: {os.path.basename(os.path.basename(pdf_path))} moved to Success folder. New file name is {os.path.basename(success_path)}."
+                    add_log_message(log_message, log_file)
+                else:
+                    add_log_message(f"ERROR: File {os.path.basename(pdf_path)} move to success failed.", log_file)
+        else:
             if os.path.exists(pdf_path):
-                fail_path = os.path.join(failed_folder, os.path.basename(pdf_path))
-                if not status and fail_path:
-                    shutil.move(pdf_path, fail_path)
+                journal.set_state(pdf_path, COMMITTING)
+                shutil.move(pdf_path, fail_path)
+                add_log_message(f"FAILED: {os.path.basename(pdf_path)} moved to Failed folder.", log_file)
+
+        if status and os.path.exists(pdf_path):
+            backup_path = os.path.join(backup_folder, get_unique_filename(backup_folder, os.path.basename(pdf_path),
+                                       claiming=lambda path: journal.set_state(pdf_path, COMMITTING, backup_path=path)))
+            move_file(pdf_path, backup_path)
+            add_log_message(f"BACKUP: {os.path.basename(pdf_path)} copied to Backup folder.", log_file)
+    
+    except Exception as e:
+        # print(e)
+        if os.path.exists(pdf_path):
+            fail_path = os.path.join(failed_folder, os.path.basename(pdf_path))
+            if not status and fail_path:
+                shutil.move(pdf_path, fail_path)
 
-            add_log_message(f"{datetime_str} - Error processing {pdf_path}: {str(e)}", log_file)
+        add_log_message(f"{datetime_str} - Error processing {pdf_path}: {str(e)}", log_file)
 
-def get_unique_filename(folder, filename):
+def get_unique_filename(folder, filename, claiming=None):
     """
     Generate a unique filename by appending a counter if the file already exists.
+    The name is claimed with an empty placeholder (see utils/names.py), move
+    the file over it with move_file.
     Args:
         folder (str): The target folder where the file will be saved.
         filename (str): The original filename.
+        claiming (callable): Called with each path before it is claimed.
 
     Returns:
         str: A unique filename.
     """
-    base_name, extension = os.path.splitext(filename)
-    counter = 1
-    unique_filename = filename
-
-    # Check if the file exists and generate a new name
-    while os.path.exists(os.path.join(folder, unique_filename)):
-        unique_filename = f"{base_name}_{counter}{extension}"
-        counter += 1
+    path = name_reserver.reserve(os.path.join(folder, filename), continue_version=False, claiming=claiming)
+    return os.path.basename(path)
+
+def same_volume(path_a, path_b):
+    """True when the folders of both paths are on the same volume, st_dev of a folder is only looked up once."""
+    devices = []
+    for folder in (os.path.dirname(path_a), os.path.dirname(path_b)):
+        if folder not in folder_volumes:
+            folder_volumes[folder] = os.stat(folder).st_dev
+        devices.append(folder_volumes[folder])
+    return devices[0] == devices[1]
+
+def link_file(src, dst):
+    """Make dst, a reserved placeholder, a hard link to src. False when the volume has no hard links."""
+    temp_path = f"{dst}.{os.getpid()}.{threading.get_ident()}.link"
+    try:
+        os.link(src, temp_path)
+    except OSError as e:
+        logger.debug("Cannot link %s: %s", src, e)
+        return False
+    os.replace(temp_path, dst)
+    name_reserver.written(dst)
+    return True
+
+def copy_file(src, dst):
+    """
+    Copy src over dst inside the kernel: os.copy_file_range where the OS has
+    it (it can clone or copy server side), otherwise shutil's copy, which uses
+    sendfile or fcopyfile where it can.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as source, open(dst, "wb") as target:
+                remaining = os.fstat(source.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(source.fileno(), target.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                shutil.copymode(src, dst)
+                return
+        except OSError as e:
+            logger.debug("copy_file_range failed for %s: %s", src, e)
+    shutil.copy(src, dst)
+
+def move_file(src, dst):
+    """Move src to dst, replacing the placeholder of a reserved name. A rename on one volume."""
+    try:
+        os.replace(src, dst)
+        name_reserver.written(dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        copy_file(src, dst)
+        shutil.copystat(src, dst)
+        os.remove(src)
+
+def remove_placeholder(path):
+    """Free a reserved name that was not written."""
+    try:
+        if os.path.getsize(path) == 0:
+            os.remove(path)
+    except OSError:
+        pass
 
-    return unique_filename
+def get_debug_path(datetime_str):
+    """
+    Path of the annotated debug image of one file, None when SAVE_DEBUG_IMAGES is off.
+    Images of earlier runs are deleted the first time this is called.
+    """
+    global image_folder_ready
+    if not SAVE_DEBUG_IMAGES:
+        return None
+    if not image_folder_ready:
+        delete_folders(image_folder)
+        os.makedirs(image_folder, exist_ok=True)
+        image_folder_ready = True
+    return image_folder / f"image_{datetime_str}.jpg"
 
 def crop_init_image(images, crop_width=CROP_WIDTH):
+    from PIL import Image
 
     width, height = images[0].size
     if width > crop_width:
@@ -192,31 +291,29 @@ def delete_folders(*folder_paths):
         if folder_path and os.path.exists(folder_path):
             try:
                 shutil.rmtree(folder_path)
-                print(f"Deleted folder: {folder_path}")
+                logger.debug("Deleted folder: %s", folder_path)
             except Exception as e:
-                print(f"Error deleting folder {folder_path}: {e}")
+                logger.error("Error deleting folder %s: %s", folder_path, e)
         else:
-            print(f"Folder does not exist: {folder_path}")
+            logger.debug("Folder does not exist: %s", folder_path)
 
 def get_memory_usage():
     """Get the current memory usage of the process in MB"""
+    import psutil
     process = psutil.Process(os.getpid())
     memory_info = process.memory_info()
     return memory_info.rss / (1024 ** 2)
 
-def get_dynamic_batch_size():
-    """Calculate the batch size dynamically based on system resources. (unit: MB)"""
-    total_memory = psutil.virtual_memory().total / (1024 ** 2)
-    available_memory = psutil.virtual_memory().available / (1024 ** 2)
-    cpu_cores = os.cpu_count()
-
-    memory_per_file = 200
-
-    batch_size_based_on_memory = max(1, int(available_memory / memory_per_file))
-    batch_size_based_on_cpu = max(1, cpu_cores - 1)
-
-    return min(batch_size_based_on_memory, batch_size_based_on_cpu)
-
+def get_worker_count():
+    """Number of OCR worker processes, OCR_WORKERS or based on CPU cores and available memory (unit: MB)."""
+    if OCR_WORKERS > 0:
+        return OCR_WORKERS
 
+    import psutil
+    available_memory = psutil.virtual_memory().available / (1024 ** 2)
+    cpu_cores = os.cpu_count() or 2
 
+    workers_based_on_memory = max(1, int(available_memory / MEMORY_PER_WORKER))
+    workers_based_on_cpu = max(1, cpu_cores - 1)
 
+    return min(workers_based_on_memory, workers_based_on_cpu)
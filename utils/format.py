@@ -1,26 +1,182 @@
 
 
+import logging
 import os
 import re
 import shutil
 from pathlib import Path
-from difflib import get_close_matches
 from datetime import datetime
-from thefuzz import fuzz
+from difflib import SequenceMatcher
+from threading import Lock
+from utils.names import name_reserver
+
+logger = logging.getLogger(__name__)
 
 # def find_best_match(file_name, folder_path):
 #     folder_names = [f for f in os.listdir(folder_path) if os.path.isdir(os.path.join(folder_path, f))]
 #     closest_matches = get_close_matches(file_name, folder_names, n=1, cutoff=0.6)  # Adjust cutoff as needed
 #     return closest_matches[0] if closest_matches else None
 
+FULL_NAME_PATTERN = re.compile(r"(.*?)-(S.*?)(?:-(\d{1,2}-[A-Za-z]{3}-\d{2}))?(?:_(\d+))?\.pdf")
+CX_NAME_PATTERN = re.compile(r"^.+?-CX-(S(?:[^-]*))(?:-(\d{1,2}-[A-Za-z]{3}-\d{2}))?$")
+
+
+# fuzzy matches of a model name need at least this ratio, 0-1
+MATCH_CUTOFF = 0.8
+
+
+def name_trigrams(name):
+    """Lowercase character trigrams of a name, padded so short names have some."""
+    padded = f"  {name.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def min_shared_trigrams(name_length, name_trigram_count, candidate_length, cutoff):
+    """
+    Fewest trigrams a name shares with a candidate of candidate_length when
+    their ratio is at least cutoff, 0 or less when a candidate sharing none
+    can still match.
+
+    A ratio of at least cutoff needs `matched` common characters. The name
+    becomes the candidate by deleting its other characters, each deletion
+    breaks at most 3 of the name's trigrams, and inserting the candidate's
+    other characters, each insertion breaks at most 2.
+    """
+    total = name_length + candidate_length
+    matched = int(cutoff * total / 2)
+    while 2.0 * matched / total < cutoff:
+        matched += 1
+    if matched > min(name_length, candidate_length):
+        return float("inf")
+    return name_trigram_count - 3 * (name_length - matched) - 2 * (candidate_length - matched)
+
+def name_scorer(name, cutoff):
+    """
+    Function scoring folder names against name, 0-1, with difflib's ratio like
+    difflib.get_close_matches. Scores below cutoff may be returned as 0.
+    """
+    # the way difflib.get_close_matches scores, name is analysed once
+    matcher = SequenceMatcher()
+    matcher.set_seq2(name)
+
+    def score(candidate):
+        matcher.set_seq1(candidate)
+        if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+            return 0
+        return matcher.ratio()
+    return score
+
+
+class ModelFolderIndex:
+    """
+    Names of the folders in each Success folder, so placing a file does not
+    list the Success folder. A folder is listed again when its modification
+    time changes, e.g. when folders were added or removed by hand; folders
+    created through add() are recorded without listing.
+
+    The names are indexed by trigram, closest() only scores the names that
+    share enough trigrams with the one looked up to reach the cutoff, see
+    min_shared_trigrams. It returns what difflib.get_close_matches would.
+
+    The lock only covers reading and updating the index in memory; folders
+    are listed and created outside it, so workers placing files in different
+    folders do not wait for each other's disk access.
+    """
+
+    def __init__(self):
+        # folder_path -> {"mtime", "names", "trigrams": trigram -> set of names}
+        self.folders = {}
+        self.lock = Lock()
+
+    def listing(self, folder_path):
+        """Cached entry of folder_path, listed again if it changed. Read it with the lock held."""
+        mtime = os.stat(folder_path).st_mtime_ns
+        with self.lock:
+            cached = self.folders.get(folder_path)
+            if cached is not None and cached["mtime"] == mtime:
+                return cached
+
+        listed = {"mtime": mtime, "names": set(), "trigrams": {}}
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    self.index_name(listed, entry.name)
+        with self.lock:
+            self.folders[folder_path] = listed
+        return listed
+
+    def index_name(self, cached, name):
+        cached["names"].add(name)
+        for trigram in name_trigrams(name):
+            cached["trigrams"].setdefault(trigram, set()).add(name)
+
+    def closest(self, folder_path, name, cutoff=MATCH_CUTOFF):
+        """
+        Folder name in folder_path most similar to name, with a ratio of at
+        least cutoff. name itself when such a folder exists, None when no
+        folder is close enough.
+        """
+        cached = self.listing(folder_path)
+        with self.lock:
+            if name in cached["names"]:
+                return name
+
+            trigrams = name_trigrams(name)
+            shared = {}
+            for trigram in trigrams:
+                for candidate in cached["trigrams"].get(trigram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+
+            # bounds of each candidate length that can reach cutoff
+            min_shared = {}
+            for length in range(1, int(len(name) * (2 - cutoff) / cutoff) + 2):
+                min_shared[length] = min_shared_trigrams(len(name), len(trigrams), length, cutoff)
+            if any(bound <= 0 for bound in min_shared.values()):
+                # names sharing no trigram can match too, e.g. short names
+                candidates = list(cached["names"])
+            else:
+                candidates = list(shared)
+
+        score = name_scorer(name, cutoff)
+        best, best_score = None, cutoff
+        # names sharing the most first, the best score rises early
+        for candidate in sorted(candidates, key=lambda candidate: shared.get(candidate, 0), reverse=True):
+            if shared.get(candidate, 0) < min_shared.get(len(candidate), float("inf")):
+                continue
+            # the ratio can not be above 2 * shorter / (both lengths)
+            if 2 * min(len(name), len(candidate)) / (len(name) + len(candidate)) < best_score:
+                continue
+            candidate_score = score(candidate)
+            # ties go to the greater name, like difflib.get_close_matches
+            if candidate_score > best_score or (candidate_score == best_score and (best is None or candidate > best)):
+                best, best_score = candidate, candidate_score
+        return best
+
+    def add(self, folder_path, name):
+        """Create folder_path/name if needed and record it. Returns its path."""
+        path = os.path.join(folder_path, name)
+        os.makedirs(path, exist_ok=True)
+        mtime = os.stat(folder_path).st_mtime_ns
+        with self.lock:
+            cached = self.folders.get(folder_path)
+            if cached is not None and name not in cached["names"]:
+                # the new folder changed the mtime, it is indexed here instead of listing again
+                cached["mtime"] = mtime
+                self.index_name(cached, name)
+        return path
+
+    def clear(self, folder_path=None):
+        with self.lock:
+            if folder_path is None:
+                self.folders.clear()
+            else:
+                self.folders.pop(folder_path, None)
+
+
+model_folders = ModelFolderIndex()
+
+
 def find_best_match(file_name, folder_path):
-    folder_names = [f for f in os.listdir(folder_path) if os.path.isdir(os.path.join(folder_path, f))]
-    if file_name in folder_names:
-        return file_name
-    closest_matches = get_close_matches(file_name, folder_names, n=1, cutoff=0.8) 
-    if closest_matches:
-        return max(closest_matches, key=len)
-    return closest_matches[0] if closest_matches else None
+    return model_folders.closest(folder_path, file_name)
 
 def format_version(version):
     if version:
@@ -76,28 +232,75 @@ def validate_and_correct_date(date_str):
             day = f"1{day[1]}"
 
         corrected_date = f"{day}-{month}-{year}"
-        print("Correct Date: ", corrected_date)
+        logger.debug("Correct Date: %s", corrected_date)
 
         datetime.strptime(corrected_date, "%d-%b-%y")  # Will raise ValueError if invalid
         return corrected_date
     except ValueError:
         return "No Date"
     
-def rename_with_versioning(new_file_path):
-    base, ext = os.path.splitext(new_file_path)
-
-    match = re.match(r"(.*?)(_([0-9]+))$", base)
-    if match:
-        base = match.group(1) 
-        version = int(match.group(3)) + 1  
-    else:
-        version = 1  
+def rename_with_versioning(new_file_path, claiming=None):
+    """
+    new_file_path or, when it is taken, the next free name_N version of it.
+    The name is claimed with an empty placeholder, move the file over it with os.replace.
+    """
+    return name_reserver.reserve(new_file_path, claiming=claiming)
 
-    while os.path.exists(new_file_path):
-        new_file_path = f"{base}_{version}{ext}"
-        version += 1
 
-    return new_file_path
+def placement_path(file_name, folder_path, doc_type, claiming=None):
+    """
+    Where organize_files would put a new file named file_name in folder_path,
+    worked out from the name and the extracted data of this file only. The
+    model and date folders are created and the returned path is claimed with
+    an empty placeholder, see rename_with_versioning and NameReserver.reserve
+    for claiming.
+    """
+    file_name = remove_spaces_in_parentheses(re.sub(r"\s+", " ", file_name).strip())
+    doc_file    = doc_type.get('type', 'old')
+    doc_barcode = doc_type.get('barcode', '')
+    item_name   = (doc_type.get('item_name') or '').strip()
+    doc_date    = (doc_type.get('date') or '').strip()
+
+    model_name = extract_model_name(file_name)
+    match = FULL_NAME_PATTERN.match(file_name)
+
+    def target(folder_name, date, name):
+        target_folder = model_folders.add(folder_path, folder_name)
+        if date:
+            target_folder = os.path.join(target_folder, date)
+            os.makedirs(target_folder, exist_ok=True)
+        return rename_with_versioning(new_file_path=os.path.join(target_folder, name), claiming=claiming)
+
+    def full_name(model_name):
+        serial_no = extract_and_update_s_part(match.group(2))
+        date = validate_and_correct_date(match.group(3))
+        version = format_version(match.group(4))
+        datename = '' if date == 'No Date' else date
+        return date, f"{model_name}-{serial_no}-{datename}{version}.pdf"
+
+    # first pass: full name with a valid model name
+    if match and is_valid_model_name(model_name):
+        if doc_file != 1:
+            model_name = doc_barcode
+        date, name = full_name(model_name)
+        return target(model_name, date, name)
+
+    if not match and not CX_NAME_PATTERN.match(file_name) and doc_type.get('type') == 3 and item_name and doc_date:
+        return target(item_name, doc_date, file_name)
+
+    # second pass: the closest existing model folder
+    if doc_file != 1 and doc_barcode != '':
+        model_name = doc_barcode
+    best_match_folder = find_best_match(model_name, folder_path) if match else None
+    if best_match_folder:
+        date, name = full_name(model_name)
+        return target(best_match_folder, date, name)
+
+    if doc_type.get("version") == "new" and item_name and doc_date:
+        return target(item_name, doc_date, file_name)
+
+    # what organize_files leaves over goes to the Error folder
+    return target("Error", None, file_name)
 
 
 def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode": "", "type": 1}):
@@ -109,18 +312,16 @@ def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode"
     Args:
         folder_path (str): Path to the folder containing the files.
     """
-    print(folder_path, is_move, doc_type)
+    logger.debug("organize %s move=%s doc=%s", folder_path, is_move, doc_type)
     doc_version = doc_type.get('version', 1)
     doc_barcode = doc_type.get('barcode', '')
     doc_file    = doc_type.get('type', 'old')
     
 
-    print("doc: ", doc_type)
 
-    pattern = r"(.*?)-(S.*?)(?:-(\d{1,2}-[A-Za-z]{3}-\d{2}))?(?:_(\d+))?\.pdf"
     # pattern = r"^(.*?)-CX-([A-Z]{2}-[A-Z]-[A-Z]{2}-[A-Z]{2}-[A-Z0-9]{3}-\d{2}-\d-\d)(?:-(\d{1,2}-[A-Za-z]{3}-\d{2}))?(?:_(\d+))?\.pdf$"
 
-    full_name_pattern = re.compile(pattern)
+    full_name_pattern = FULL_NAME_PATTERN
     
 
     # process fully matched file - create folder
@@ -134,7 +335,7 @@ def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode"
             model_name = extract_model_name(file_name)
             is_valid = is_valid_model_name(model_name)
 
-            print("model name: ",model_name)
+            logger.debug("model name: %s", model_name)
 
             # check if should use model or barcode as folder name
             if doc_file != 1:
@@ -145,7 +346,7 @@ def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode"
                 pattern = r"^.+?-CX-(S(?:[^-]*))(?:-(\d{1,2}-[A-Za-z]{3}-\d{2}))?$"
                 match = bool(re.match(pattern, file_name))
 
-            print('match after: ', match)
+            logger.debug("match after: %s", match)
             
 
             if not match:
@@ -154,18 +355,13 @@ def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode"
                 # 'barcode': 'CI03000766001', 'type': 3, 'version': 'new', 'machine': '030', 
                 # 'supply': '00766'}
                 
-                print('in noy match')
-                
                 if doc_type.get('type') == 3 and doc_type.get('item_name') and doc_type.get('date'):
                     model_name = doc_type['item_name'].strip()
                     datename = doc_type['date'].strip()
                     
-                    print("Using fallback for NEW type:")
-                    print("Model Name:", model_name)
-                    print("Date:", datename)
+                    logger.debug("Using fallback for NEW type: model name %s, date %s", model_name, datename)
                     
-                    model_folder = os.path.join(folder_path, model_name)
-                    os.makedirs(model_folder, exist_ok=True)
+                    model_folder = model_folders.add(folder_path, model_name)
                     
                     target_folder = model_folder
                     if datename:
@@ -176,22 +372,22 @@ def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode"
                     target_file = os.path.join(target_folder, file_name)
                     target_file = rename_with_versioning(new_file_path=target_file)
                     
-                    print("Target file:", target_file)
+                    logger.debug("Target file: %s", target_file)
                     
                     try:
                         if is_move:
-                            os.rename(file_path, target_file)
+                            os.replace(file_path, target_file)
                         else:
                             shutil.copy(file_path, target_file)
                     except Exception as e:
-                        print(f"Error moving/copying {file_name}: {str(e)}")
+                        logger.error("Error moving/copying %s: %s", file_name, e)
                     continue  # done with this file
                 
-                print(f"Skipping {file_name} (Does not match pattern)")
+                logger.debug("Skipping %s (Does not match pattern)", file_name)
                 continue
             
             else:
-                print(f"Skipping {file_name} (Does not match pattern and no fallback doc_type)")
+                logger.debug("Skipping %s (Does not match pattern and no fallback doc_type)", file_name)
 
             # print('match: ', match)
             # print('is valid: ', is_valid)
@@ -201,19 +397,16 @@ def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode"
                 date = validate_and_correct_date(match.group(3))
                 version = format_version(match.group(4))
 
-                print('serial_no: ', serial_no)
-                print('date: ', date)
-                print('version: ', version)
+                logger.debug("serial_no: %s, date: %s, version: %s", serial_no, date, version)
 
                 if date == 'No Date':
                     datename = ''
                 else:
                     datename = date
 
-                print("model name after: ", model_name)
+                logger.debug("model name after: %s", model_name)
 
-                model_folder = os.path.join(folder_path, model_name)
-                os.makedirs(model_folder, exist_ok=True)
+                model_folder = model_folders.add(folder_path, model_name)
 
                 # print('model_folder: ', model_folder)
 
@@ -227,9 +420,9 @@ def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode"
 
                 target_file = rename_with_versioning(new_file_path=target_file)
 
-                print("target file: "+target_file)
+                logger.debug("target file: %s", target_file)
 
-                os.rename(file_path, target_file)
+                os.replace(file_path, target_file)
 
 
     # process file that couldn't be handle in first loop
@@ -253,20 +446,17 @@ def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode"
                 date = validate_and_correct_date(match.group(3))
                 version = format_version(match.group(4))
 
-                print('serial_no: ', serial_no)
-                print('date: ', date)
-                print('version: ', version)
-                print("model: ", model_name)
+                logger.debug("serial_no: %s, date: %s, version: %s, model: %s", serial_no, date, version, model_name)
 
                 match = full_name_pattern.match(file_name)
                 if not match:
                     pattern = r"^.+?-CX-(S(?:[^-]*))(?:-(\d{1,2}-[A-Za-z]{3}-\d{2}))?$"
                     match = bool(re.match(pattern, file_name))
 
-                # print('match after: ', match)
+                # logger.debug("match after: %s", match)
 
                 if not match: 
-                    print(f"Skipping {file_name} (Does not match pattern)")
+                    logger.debug("Skipping %s (Does not match pattern)", file_name)
                     continue
 
                 if date == 'No Date':
@@ -281,12 +471,9 @@ def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode"
                 model_name = doc_type["item_name"].strip()
                 datename = doc_type["date"].strip()
 
-                print("Using fallback for NEW type (second loop):")
-                print("Model Name:", model_name)
-                print("Date:", datename)
+                logger.debug("Using fallback for NEW type (second loop): model name %s, date %s", model_name, datename)
 
-                model_folder = os.path.join(folder_path, model_name)
-                os.makedirs(model_folder, exist_ok=True)
+                model_folder = model_folders.add(folder_path, model_name)
 
                 target_folder = model_folder
                 if datename:
@@ -303,15 +490,14 @@ def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode"
 
             try:
                 if is_move:
-                    os.rename(file_path, new_file_path)
+                    os.replace(file_path, new_file_path)
                 else:
                     shutil.copy(file_path, new_file_path)
-            except:
-                print('error')
+            except Exception as e:
+                logger.error("Error moving %s to %s: %s", file_path, new_file_path, e)
 
     # wronged format file, move it to error folder instead
-    error_folder = os.path.join(folder_path, "Error")
-    os.makedirs(error_folder, exist_ok=True)  
+    error_folder = model_folders.add(folder_path, "Error")
     for file_name in os.listdir(folder_path):
         file_path = os.path.join(folder_path, file_name)
 
@@ -319,9 +505,9 @@ def organize_files(folder_path, is_move=True, doc_type={"version": "", "barcode"
             error_path = os.path.join(error_folder, file_name)
             try:
                 os.rename(file_path, error_path)
-                print(f"Moved to Error Folder: {file_name}")
+                logger.info("Moved to Error Folder: %s", file_name)
             except Exception as e:
-                print(f"Error moving {file_name} to Error folder: {e}")
+                logger.error("Error moving %s to Error folder: %s", file_name, e)
 
     return True
 
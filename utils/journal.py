@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+home_dir = Path.home()
+journal_file = home_dir / "OCRHeader" / "jobs.db"
+
+# committed jobs are kept this long (seconds)
+KEEP_COMMITTED = 7 * 24 * 60 * 60
+
+# states of a job, in order
+QUEUED = "queued"
+RENDERING = "rendering"
+EXTRACTED = "extracted"
+COMMITTING = "committing"
+COMMITTED = "committed"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        pdf_path TEXT PRIMARY KEY,
+        state TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        result TEXT,
+        success_path TEXT,
+        backup_path TEXT
+    );
+    CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+job_journal = None
+job_journal_lock = threading.Lock()
+
+
+class JobJournal:
+    """
+    State of every file handed to OCR, in SQLite, so a restart knows which
+    files were interrupted and how far they got:
+
+    queued -> rendering -> extracted (result saved, then each Success path
+    before its placeholder is created) -> committing (target paths saved
+    before the files are moved) -> committed.
+
+    Every change is written before the step it describes starts. Each thread
+    uses its own connection.
+    """
+
+    def __init__(self, path=journal_file):
+        os.makedirs(Path(path).parent, exist_ok=True)
+        self.path = str(path)
+        self.local = threading.local()
+
+        connection = self.connect()
+        connection.executescript(SCHEMA)
+        connection.commit()
+
+    def connect(self):
+        """Connection of the calling thread."""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def queue(self, pdf_paths):
+        """Start a job for each file, a file queued before starts over."""
+        now = time.time()
+        with self.connect() as connection:
+            connection.executemany(
+                "INSERT INTO jobs (pdf_path, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (pdf_path) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at, "
+                "result = NULL, success_path = NULL, backup_path = NULL",
+                [(pdf_path, QUEUED, now) for pdf_path in pdf_paths],
+            )
+
+    def set_state(self, pdf_path, state, result=None, success_path=None, backup_path=None):
+        """Move a job to state, saving the result or target paths that are given."""
+        fields = {"state": state, "updated_at": time.time()}
+        if result is not None:
+            fields["result"] = json.dumps(result, ensure_ascii=False, default=str)
+        if success_path is not None:
+            fields["success_path"] = success_path
+        if backup_path is not None:
+            fields["backup_path"] = backup_path
+
+        columns = ", ".join(fields)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in fields)
+        with self.connect() as connection:
+            connection.execute(
+                f"INSERT INTO jobs (pdf_path, {columns}) VALUES (?{', ?' * len(fields)}) "
+                f"ON CONFLICT (pdf_path) DO UPDATE SET {updates}",
+                (pdf_path, *fields.values()),
+            )
+
+    def release(self, pdf_path, state):
+        """Move a job back to state, forgetting its Success path, e.g. after freeing its placeholder."""
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET state = ?, updated_at = ?, success_path = NULL WHERE pdf_path = ?",
+                (state, time.time(), pdf_path),
+            )
+
+    def unfinished(self):
+        """Jobs that were not committed, as dicts, the result decoded."""
+        rows = self.connect().execute(
+            "SELECT pdf_path, state, result, success_path, backup_path FROM jobs WHERE state != ? ORDER BY updated_at",
+            (COMMITTED,),
+        ).fetchall()
+        return [
+            {
+                "pdf_path": pdf_path,
+                "state": state,
+                "result": json.loads(result) if result else None,
+                "success_path": success_path,
+                "backup_path": backup_path,
+            }
+            for pdf_path, state, result, success_path, backup_path in rows
+        ]
+
+    def remove(self, pdf_path):
+        with self.connect() as connection:
+            connection.execute("DELETE FROM jobs WHERE pdf_path = ?", (pdf_path,))
+
+    def prune(self, max_age=KEEP_COMMITTED):
+        """Delete committed jobs older than max_age seconds."""
+        with self.connect() as connection:
+            connection.execute("DELETE FROM jobs WHERE state = ? AND updated_at < ?", (COMMITTED, time.time() - max_age))
+
+
+def get_job_journal():
+    """The journal of this process, opened on first use."""
+    global job_journal
+    with job_journal_lock:
+        if job_journal is None:
+            job_journal = JobJournal()
+    return job_journal
@@ -0,0 +1,176 @@
+import os
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# env
+# level of the application's own loggers: DEBUG, INFO, WARNING, ERROR
+LOG_LEVEL          = os.getenv('LOG_LEVEL', 'INFO')
+# lines reaching the writer within this many seconds are written together
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 0.5))
+
+home_dir = Path.home()
+app_log_file = home_dir / "OCRHeader" / "app.log"
+
+# loggers of these packages get LOG_LEVEL, libraries stay at WARNING
+APP_LOGGERS = ("__main__", "cli", "main", "utils", "worker", "tabs")
+
+log_writer = None
+log_writer_lock = threading.Lock()
+log_listener = None
+# set by setup_logging, used for the records of worker processes
+log_handlers = ()
+log_level = logging.INFO
+worker_records = None
+worker_records_lock = threading.Lock()
+
+
+class LogWriter:
+    """
+    Appends lines to log files from one background thread. Callers only queue
+    the line; the thread collects what arrives within LOG_FLUSH_INTERVAL and
+    opens each file once per batch.
+    """
+
+    def __init__(self, flush_interval=LOG_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.lines = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, log_file, line):
+        self.lines.put((str(log_file), line))
+
+    def flush(self, timeout=5):
+        """Wait until the lines queued so far are written."""
+        done = threading.Event()
+        self.lines.put(done)
+        return done.wait(timeout)
+
+    def run(self):
+        while True:
+            batch = [self.lines.get()]
+            deadline = datetime.now().timestamp() + self.flush_interval
+            while not isinstance(batch[-1], threading.Event):
+                remaining = deadline - datetime.now().timestamp()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.lines.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            by_file = {}
+            for item in batch:
+                if isinstance(item, tuple):
+                    by_file.setdefault(item[0], []).append(item[1])
+
+            for log_file, lines in by_file.items():
+                try:
+                    with open(log_file, "a", encoding="utf-8", errors="replace") as log:
+                        log.write("\n".join(lines) + "\n")
+                except OSError as e:
+                    sys.stderr.write(f"Cannot write {len(lines)} line(s) to {log_file}: {e}\n")
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+
+class LogWriterHandler(logging.Handler):
+    """logging handler that hands formatted records to the LogWriter."""
+
+    def __init__(self, log_file):
+        super().__init__()
+        self.log_file = log_file
+
+    def emit(self, record):
+        try:
+            get_log_writer().write(self.log_file, self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+def get_log_writer():
+    """The writer of this process, started on first use."""
+    global log_writer
+    with log_writer_lock:
+        if log_writer is None:
+            log_writer = LogWriter()
+            atexit.register(log_writer.flush)
+    return log_writer
+
+def write_log_line(log_file, message):
+    """Queue a timestamped line for a log file, the timestamp is taken now."""
+    get_log_writer().write(log_file, f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
+
+def setup_logging(level=None):
+    """
+    Send the application's log records through a queue to the console and
+    ~/OCRHeader/app.log, both written from a background thread. Safe to call
+    more than once. Worker processes send their records back to this process,
+    see worker_logging.
+    """
+    global log_listener, log_handlers, log_level
+    if log_listener is not None:
+        return
+
+    level = getattr(logging, str(level or LOG_LEVEL).upper(), logging.INFO)
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    console = logging.StreamHandler()
+    console.setFormatter(formatter)
+    os.makedirs(app_log_file.parent, exist_ok=True)
+    app_log = LogWriterHandler(app_log_file)
+    app_log.setFormatter(formatter)
+
+    # the writer must exist before the listener so it is flushed after the listener stops
+    get_log_writer()
+    records = queue.Queue()
+    log_handlers, log_level = (console, app_log), level
+    log_listener = logging.handlers.QueueListener(records, *log_handlers, respect_handler_level=True)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
+    set_log_handler(logging.handlers.QueueHandler(records), level)
+
+def set_log_handler(handler, level):
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(logging.WARNING)
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(level)
+
+def worker_logging():
+    """
+    initializer and initargs for a ProcessPoolExecutor, so its processes log
+    through this process. Forked processes inherit the queue handler but not
+    the threads that empty it, spawned ones inherit nothing; either way their
+    records would be lost. Nothing to set up when setup_logging was not called.
+    """
+    global worker_records
+    if log_listener is None:
+        return None, ()
+    with worker_records_lock:
+        if worker_records is None:
+            worker_records = multiprocessing.Queue()
+            listener = logging.handlers.QueueListener(worker_records, *log_handlers, respect_handler_level=True)
+            listener.start()
+            # registered after the writer, so stopped before it is flushed
+            atexit.register(listener.stop)
+    return setup_worker_logging, (worker_records, log_level)
+
+def setup_worker_logging(records, level):
+    """Runs in each worker process: send its records to the process that started it."""
+    global log_writer
+    # a forked copy of the parent's writer has no thread, start a new one if needed
+    log_writer = None
+    set_log_handler(logging.handlers.QueueHandler(records), level)
@@ -0,0 +1,126 @@
+import os
+import re
+from threading import Lock
+
+# base name and version of a file name, e.g. "a-b_3" -> ("a-b", "3")
+VERSION_PATTERN = re.compile(r"^(.*?)(?:_([0-9]+))?$")
+
+
+def name_key(base, ext):
+    return os.path.normcase(base), os.path.normcase(ext)
+
+
+class NameReserver:
+    """
+    Picks free file names of the form name.ext, name_1.ext, name_2.ext, ...
+
+    The names in use and the highest version of every base name of each folder
+    are kept in memory, so a free name is usually found with one exclusive
+    create instead of an existence check per version. A folder is listed again
+    when its modification time changes, e.g. when files were moved out of it,
+    so freed names are used again; names claimed and written here update the
+    recorded time instead, see written().
+    A name is claimed by creating an empty placeholder with O_EXCL, so two
+    threads or processes never get the same name; the caller writes the file
+    over it with os.replace or a copy. Files added by others are found when
+    the exclusive create fails and the next version is tried.
+
+    Each folder has its own lock, held only while a name is picked, so
+    workers only wait for each other when they write into the same folder.
+    """
+
+    def __init__(self):
+        # folder -> {"lock", "mtime", "names": set of file names, "versions": (base, ext) -> highest version}
+        self.folders = {}
+        self.lock = Lock()
+
+    def folder_state(self, folder):
+        """State of one folder, hold its lock while using it. Folders do not wait for each other."""
+        with self.lock:
+            state = self.folders.get(folder)
+            if state is None:
+                state = self.folders[folder] = {"lock": Lock(), "mtime": None, "names": set(), "versions": {}}
+        return state
+
+    def list_folder(self, folder, state):
+        """Names in use in folder, listed again if it changed. Call with the folder's lock held."""
+        mtime = os.stat(folder).st_mtime_ns
+        if state["mtime"] != mtime:
+            state["names"], state["versions"] = set(), {}
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    self.record(state, entry.name)
+            state["mtime"] = mtime
+
+    def record(self, state, name):
+        state["names"].add(os.path.normcase(name))
+        base, ext = os.path.splitext(name)
+        base, version = VERSION_PATTERN.match(base).groups()
+        key = name_key(base, ext)
+        state["versions"][key] = max(state["versions"].get(key, 0), int(version or 0))
+
+    def next_candidate(self, folder, name, base, ext, version):
+        """Name to try next, recorded as used before it is tried."""
+        state = self.folder_state(folder)
+        with state["lock"]:
+            self.list_folder(folder, state)
+            if os.path.normcase(name) not in state["names"]:
+                candidate = name
+            else:
+                version = max(version, state["versions"].get(name_key(base, ext), 0) + 1)
+                candidate = f"{base}_{version}{ext}"
+            self.record(state, candidate)
+        return candidate
+
+    def reserve(self, path, continue_version=True, claiming=None):
+        """
+        Claim path, or the next free version of it, and return the claimed path.
+        An empty file is left at the path. With continue_version a name that
+        already has a version, e.g. name_3.ext, continues at name_4.ext;
+        otherwise it becomes name_3_1.ext. claiming, if given, is called with
+        each path before it is created, e.g. to record it in the job journal.
+        """
+        folder, name = os.path.split(path)
+        folder = folder or "."
+        base, ext = os.path.splitext(name)
+        version = 1
+        if continue_version:
+            match = VERSION_PATTERN.match(base)
+            if match.group(2):
+                base, version = match.group(1), int(match.group(2)) + 1
+
+        while True:
+            candidate = self.next_candidate(folder, name, base, ext, version)
+            candidate_path = os.path.join(folder, candidate)
+            if claiming is not None:
+                claiming(candidate_path)
+            try:
+                os.close(os.open(candidate_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                self.written(candidate_path)
+                return candidate_path
+            except FileExistsError:
+                # created by someone else since the folder was listed, already recorded
+                continue
+
+    def written(self, path):
+        """
+        A claimed path was created or replaced here, its folder is not listed
+        again for that change. Files another process adds meanwhile are still
+        found by the exclusive create.
+        """
+        folder = os.path.dirname(path) or "."
+        state = self.folder_state(folder)
+        with state["lock"]:
+            if state["mtime"] is not None:
+                state["mtime"] = os.stat(folder).st_mtime_ns
+
+    def forget(self, folder=None):
+        """Drop what is known about a folder, or all folders, it is listed again on next use."""
+        with self.lock:
+            if folder is None:
+                self.folders.clear()
+            else:
+                self.folders.pop(folder, None)
+
+
+name_reserver = NameReserver()
@@ -1,10 +1,12 @@
+import logging
 import cv2
-import pytesseract
+from utils.engine import image_to_string, image_to_data
 import re
 import os
 from PIL import Image
 import numpy as np
-import easyocr
+
+logger = logging.getLogger(__name__)
 
 # env
 SHARPNESS    = int(os.getenv('SHARPNESS', 650))
@@ -13,6 +15,7 @@ CROP_WIDTH   = int(os.getenv('CROP_WIDTH', 4000))
 CROP_HEIGHT  = int(os.getenv('CROP_HEIGHT', 300))
 MIN_CELL_WIDTH  = int(os.getenv('MIN_CELL_WIDTH', 250))
 MIN_CELL_HEIGHT = int(os.getenv('MIN_CELL_HEIGHT', 100))
+CELL_OCR_MODE   = os.getenv('CELL_OCR_MODE', 'single')
 
 test = [{'cell_number': 1, 'coordinates': (0, 0, 4000, 300), 'text': 'yom Bao Me _ eo 7.\n, .- SS-F-PR-ST-047-81-1/3\ni . Mnluvinaszadaunisviwiwudaas ST 1x5x0.38H] (MRF)-DF-RHA'}, {'cell_number': 1, 'coordinates': (2038, 202, 288, 171), 'text': '}-F-PR-ST-047-81-1/3\n_'}, {'cell_number': 2, 'coordinates': (828, 202, 658, 167), 'text': 'niuvinaszadaUuNIsviaWIUAAaY ST 1)\n(Check Sheet of Work ST 1x5x0.38\nty'}, {'cell_number': 3, 'coordinates': (1486, 202, 549, 167), 'text': 'Ss\n5x0.38HI (MRF)-DF-RHA\nHI (MRF)-DF-RHA)'}, {'cell_number': 4, 'coordinates': (324, 237, 1998, 127), 'text': 'ie UhluvinasyadaunasviwwiUyaY ST 1x5x0.38HI (MRE)-DF-RHA\n(Check Sheet of Work ST 1x5x0.3GHI (MRF)-DF-RHA)'}]
 
@@ -225,6 +228,23 @@ def format_document_name(item_name):
 
     return item_name
 
+def scale_px(value, scale=1.0):
+    """Scale a pixel size measured at 300 DPI to the DPI the page was rendered at."""
+    return max(1, int(round(value * scale)))
+
+def scale_box(box, scale=1.0):
+    """Scale an (x, y, w, h) region measured at 300 DPI."""
+    return tuple(int(round(v * scale)) for v in box)
+
+def load_image(image):
+    """
+    Return the page as a BGR NumPy array.
+    Rendered pages are passed around in memory; a path is only read for debugging.
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    return cv2.imread(str(image))
+
 def measure_sharpness(image):
     """
     Measure the sharpness of an image using Laplacian varian
@@ -234,15 +254,16 @@ def measure_sharpness(image):
     return laplacian_var
 
 
-def preprocess_image(image_path, output_path, crop_region=(400, 80, 4000, 190)):
+def preprocess_image(image, output_path=None, crop_region=(400, 80, 4000, 190)):
     """
     process blurred image
     """
-    image = cv2.imread(image_path)
+    image = load_image(image)
     if crop_region:
         x, y, w, h = crop_region
         image = image[y:y + h, x:x + w]
-        cv2.imwrite(image_path, image)
+        if output_path:
+            cv2.imwrite(str(output_path), image)
     
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     # noise reduction 
@@ -256,7 +277,7 @@ def preprocess_image(image_path, output_path, crop_region=(400, 80, 4000, 190)):
 
     thresh = cv2.threshold(sharpened_img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
 
-    text = pytesseract.image_to_string(thresh, config="--psm 6")
+    text = image_to_string(thresh, config="--psm 6")
     text = text.strip()
 
     extracted_texts = [{"text":"", "coordinates":"", "cell_number":""}]
@@ -291,27 +312,29 @@ def preprocess_image(image_path, output_path, crop_region=(400, 80, 4000, 190)):
     return processed_image
 
 
-def detect_table_in_image(image_path, rand=0, min_cell_width=MIN_CELL_WIDTH, min_cell_height=MIN_CELL_HEIGHT):
+def detect_table_in_image(image, rand=0, min_cell_width=MIN_CELL_WIDTH, min_cell_height=MIN_CELL_HEIGHT, debug_path=None, scale=1.0):
     """
     Detect the table and its cells in an image, and number each cell.
 
     Args:
-        image_path (str): Path to the input image.
+        image (np.ndarray | str): Rendered page (BGR) or path to the input image.
         min_cell_width (int): Minimum width of a cell to filter noise.
         min_cell_height (int): Minimum height of a cell to filter noise.
+        debug_path (str): If set, save the image with bounding boxes and numbers here.
+        scale (float): Render DPI divided by 300, all sizes above are at 300 DPI.
 
     Returns:
-        List[tuple]: List of bounding boxes for table cells (x, y, w, h).
-        str: Path to the saved image with bounding boxes and numbers.
+        list[dict]: Extracted text of each cell with its number and coordinates.
     """
-    # read image file
-    image = cv2.imread(image_path)
+    image = load_image(image)
+    # boxes are only drawn for debugging, never on the shared page buffer
+    annotated = image.copy() if debug_path else None
 
     # measure sharpness, if blurred -> need preprocessed, if clear -> continue
     sharpness = measure_sharpness(image)
     is_blurred = sharpness < SHARPNESS
     # is_blurred = True
-    extracted_texts_blur = preprocess_image(image_path, image_path, (0, 0, CROP_WIDTH, CROP_HEIGHT))
+    extracted_texts_blur = preprocess_image(image, None, scale_box((0, 0, CROP_WIDTH, CROP_HEIGHT), scale))
 
     # if is_blurred:
     #     extracted_texts = preprocess_image(image_path, image_path, (0, 0, CROP_WIDTH, CROP_HEIGHT))
@@ -321,8 +344,8 @@ def detect_table_in_image(image_path, rand=0, min_cell_width=MIN_CELL_WIDTH, min
 
     _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY_INV)
 
-    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (30, 1)))
-    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, 30)))
+    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (scale_px(30, scale), 1)))
+    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, scale_px(30, scale))))
 
     table_mask = cv2.bitwise_or(horizontal, vertical)
 
@@ -343,33 +366,43 @@ def detect_table_in_image(image_path, rand=0, min_cell_width=MIN_CELL_WIDTH, min
             table_bounding_box = (x, y, w, h)
 
     if not table_bounding_box:
-        print("No table detected.")
+        logger.debug("No table detected.")
         return []
 
     x, y, w, h = table_bounding_box
     table_region = binary[y:y + h, x:x + w]
 
+    min_width = scale_px(MIN_CELL_WIDTH, scale)
+    min_height = scale_px(MIN_CELL_HEIGHT, scale)
+    max_height = scale_px(130, scale)
+    text_padding = scale_px(TEXT_PADDING, scale)
+
     cell_contours, _ = cv2.findContours(table_region, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
     for cell in cell_contours:
         cx, cy, cw, ch = cv2.boundingRect(cell)
         # cell_bounding_boxes.append((x + cx, y + cy, cw, ch))
-        if cw >= MIN_CELL_WIDTH and ch > MIN_CELL_HEIGHT and ch < 130:
-            if cw < 1000:
-                adjusted_y = max(0, cy - TEXT_PADDING)
+        if cw >= min_width and ch > min_height and ch < max_height:
+            if cw < scale_px(1000, scale):
+                adjusted_y = max(0, cy - text_padding)
                 adjusted_h = ch + (cy - adjusted_y)
-                cell_bounding_boxes.append((x + cx, y - TEXT_PADDING, cw, adjusted_h + TEXT_PADDING))  # Filter small noise
+                cell_bounding_boxes.append((x + cx, y - text_padding, cw, adjusted_h + text_padding))  # Filter small noise
             else:
                 cell_bounding_boxes.append((x + cx, y + cy, cw, ch))  # Add offset for table position
 
-    print(len(cell_bounding_boxes))
+    logger.debug("%d cells detected", len(cell_bounding_boxes))
 
     # !!! Important
     # cell_bounding_boxes = sorted(cell_bounding_boxes, key=lambda box: (box[1], box[0]))
 
-    for i, (x, y, w, h) in enumerate(cell_bounding_boxes):
-        cell_image = image[y:y + h, x:x + w]
+    # one engine call for the whole table, words are assigned to cells afterwards
+    cell_texts = ocr_cells_single_pass(image, cell_bounding_boxes) if CELL_OCR_MODE == 'single' else None
 
-        text = pytesseract.image_to_string(cell_image, config="--psm 6 --oem 1").strip()
+    for i, (x, y, w, h) in enumerate(cell_bounding_boxes):
+        if cell_texts is not None:
+            text = cell_texts[i]
+        else:
+            cell_image = image[y:y + h, x:x + w]
+            text = image_to_string(cell_image, config="--psm 6 --oem 1").strip()
         # extracted_texts.append({
         #     "cell_number": i + 1,
         #     "coordinates": (x, y, w, h),
@@ -382,7 +415,10 @@ def detect_table_in_image(image_path, rand=0, min_cell_width=MIN_CELL_WIDTH, min
             "text": text
         })
 
-        cv2.rectangle(image, (x, y), (x + w, y + h), (255, 0, 0), 3)
+        if annotated is None:
+            continue
+
+        cv2.rectangle(annotated, (x, y), (x + w, y + h), (255, 0, 0), 3)
 
 
         # below is to draw number over detected box, in case need test!!!
@@ -395,19 +431,67 @@ def detect_table_in_image(image_path, rand=0, min_cell_width=MIN_CELL_WIDTH, min
         text_size = cv2.getTextSize(cell_number, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)[0]
         text_x = x + (w - text_size[0]) // 2
         text_y = y + (h + text_size[1]) // 2
-        cv2.putText(image, cell_number, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 0, 0), thickness)
+        cv2.putText(annotated, cell_number, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 0, 0), thickness)
 
 
     # Save the image with bounding boxes and numbers
-    output_path = f"./image/000{rand}.jpg"
-    cv2.imwrite(image_path, image)
-    print(f"Bounding box image with numbers saved to: {image_path}")
+    if annotated is not None:
+        cv2.imwrite(str(debug_path), annotated)
+        logger.debug("Bounding box image with numbers saved to: %s", debug_path)
 
     extracted_texts = merge_extracted_texts(extracted_texts_blur, extracted_texts_clear)
 
     return extracted_texts
 
 
+def ocr_cells_single_pass(image, cell_bounding_boxes, config="--psm 6 --oem 1"):
+    """
+    OCR the area covering all cells once and assign each word to the cells
+    that contain its center. Overlapping cells both get the word, like the
+    per-cell crops did.
+
+    Args:
+        image (np.ndarray): The page image.
+        cell_bounding_boxes (list[tuple]): Cell boxes (x, y, w, h).
+
+    Returns:
+        list[str]: Text of each cell, in the order of cell_bounding_boxes.
+    """
+    if not cell_bounding_boxes:
+        return []
+
+    page_h, page_w = image.shape[:2]
+    left = max(0, min(x for x, y, w, h in cell_bounding_boxes))
+    top = max(0, min(y for x, y, w, h in cell_bounding_boxes))
+    right = min(page_w, max(x + w for x, y, w, h in cell_bounding_boxes))
+    bottom = min(page_h, max(y + h for x, y, w, h in cell_bounding_boxes))
+
+    data = image_to_data(image[top:bottom, left:right], config=config)
+
+    cell_words = [[] for _ in cell_bounding_boxes]
+    for i, word in enumerate(data["text"]):
+        word = str(word).strip()
+        if not word:
+            continue
+        center_x = left + data["left"][i] + data["width"][i] / 2
+        center_y = top + data["top"][i] + data["height"][i] / 2
+        line_key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        for index, (x, y, w, h) in enumerate(cell_bounding_boxes):
+            if x <= center_x < x + w and y <= center_y < y + h:
+                cell_words[index].append((line_key, data["word_num"][i], word))
+
+    cell_texts = []
+    for words in cell_words:
+        lines = []
+        current_key = None
+        for line_key, _, word in sorted(words):
+            if line_key != current_key:
+                lines.append([])
+                current_key = line_key
+            lines[-1].append(word)
+        cell_texts.append("\n".join(" ".join(line) for line in lines))
+    return cell_texts
+
 def merge_extracted_texts(blurred_texts, clear_texts):
     """
     Merge texts from blurred and clear processing paths, avoiding duplicates.
@@ -484,15 +568,15 @@ def extract_information(text):
 
     return extracted_data
 
-def classify_document_type(image_path):
+def classify_document_type(image, debug_path=None, scale=1.0, regions=None):
     """
     3 formats 
         1. old + ''
         2. old + '{barcode}'
         3. new + '{barcode}'
     """
-    image = cv2.imread(image_path)
-    info = detect_header_type(image, image_path)
+    image = load_image(image)
+    info = detect_header_type(image, debug_path, scale=scale, regions=regions)
     # barcode = detect_barcode(image_path)
     version = info.get('version', 'old')
     barcode = info.get('barcode', '')
@@ -504,18 +588,37 @@ def classify_document_type(image_path):
     if version == 'new':
         info['type'] = 3
         
-    print('info: ', info)
+    logger.debug("info: %s", info)
+
+    return info
 
+def read_header_roi(roi_image):
+    """OCR a yellow or black header area: inverted gray, enlarged 2x."""
+    gray_roi = cv2.cvtColor(roi_image, cv2.COLOR_BGR2GRAY)
+    gray_roi = cv2.bitwise_not(gray_roi)
+    gray_roi = cv2.resize(gray_roi, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+    # ocr 
+    return image_to_string(gray_roi, config="--psm 4")
+
+def header_info_from_texts(yellow_texts, black_texts):
+    """Build the header info from the OCR text of the yellow and black areas."""
+    cell_text = ''.join(text.strip() + "\n" for text in yellow_texts + black_texts)
+    logger.debug("cell text: %s", cell_text)
+
+    info  = extract_information(cell_text)
+    info['item_name'] = match_document_name(''.join(black_texts))
     return info
 
-def detect_header_type(image, image_path):
+def detect_header_type(image, debug_path=None, scale=1.0, regions=None):
     """
     detect the cell header of file if have SSWT
     if old -> old document
     if new -> new document
+    scale is the render DPI divided by 300
+    regions, if given, receives the 'yellow' and 'black' areas read (x, y, w, h at 300 DPI)
     """
 
-    header_roi = (60, 50, 3000, 350)
+    header_roi = scale_box((60, 50, 3000, 350), scale)
     
     if header_roi:
         x, y, w, h = header_roi
@@ -523,6 +626,9 @@ def detect_header_type(image, image_path):
     else:
         header_image = image
 
+    # header_image is a view of the shared page, draw detected areas on a copy
+    annotated = header_image.copy() if debug_path else None
+
     cell_text = ''
     yellow_detected = False
     black_table_detected = False
@@ -553,53 +659,47 @@ def detect_header_type(image, image_path):
     edges = cv2.Canny(black_mask, 50, 150)
     black_contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    # extracted_text = pytesseract.image_to_string(header_image, config="--oem 1 --psm 3 -c preserve_interword_spaces=1")  
+    # extracted_text = image_to_string(header_image, config="--oem 1 --psm 3 -c preserve_interword_spaces=1")  
     # cell_text += extracted_text.strip() + "\n"
     # print(cell_text)
     # return
     
-    index = 1
+    def page_box(x, y, w, h):
+        # area inside header_image -> page coordinates at 300 DPI
+        return tuple(int(round(v / scale)) for v in (x + header_roi[0], y + header_roi[1], w, h))
+
+    yellow_texts = []
+    yellow_boxes = []
     for contour in yellow_contours:
         x, y, w, h = cv2.boundingRect(contour)
-        if w > 20 and h > 20: 
+        if w > scale_px(20, scale) and h > scale_px(20, scale): 
             yellow_detected = True
-            cv2.rectangle(header_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            if annotated is not None:
+                cv2.rectangle(annotated, (x, y), (x + w, y + h), (0, 255, 0), 2)
             # extract yellow are for text recog.
-            roi_text = header_image[y:y+h, x:x+w]
-            gray_roi = cv2.cvtColor(roi_text, cv2.COLOR_BGR2GRAY)
-            gray_roi = cv2.bitwise_not(gray_roi)
-            gray_roi = cv2.resize(gray_roi, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-            # ocr 
-            extracted_text = pytesseract.image_to_string(gray_roi, config="--psm 4")  
-            cell_text += extracted_text.strip() + "\n"
-
-            index += 1
+            yellow_texts.append(read_header_roi(header_image[y:y+h, x:x+w]))
+            yellow_boxes.append(page_box(x, y, w, h))
 
     if yellow_detected:
-        black_cell_text = ''
+        black_texts = []
+        black_boxes = []
         for i, contour in enumerate(black_contours):
             x, y, w, h = cv2.boundingRect(contour)
-            if w > 550 and (100 > h > 50):  # Adjust threshold to remove noise
-                cv2.rectangle(header_image, (x, y), (x + w, y + h), (0, 0, 255), 2)  # Red for table borders
-
-                roi_text = header_image[y:y+h, x:x+w]
-                gray_roi = cv2.cvtColor(roi_text, cv2.COLOR_BGR2GRAY)
-                gray_roi = cv2.bitwise_not(gray_roi)
-                gray_roi = cv2.resize(gray_roi, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-                # ocr 
-                extracted_text = pytesseract.image_to_string(gray_roi, config="--psm 4")  
-                black_cell_text += extracted_text
-                cell_text += extracted_text.strip() + "\n"
-
-        cv2.imwrite(image_path, header_image)
-        
-        print("cell text: ",cell_text)
+            if w > scale_px(550, scale) and (scale_px(100, scale) > h > scale_px(50, scale)):  # Adjust threshold to remove noise
+                if annotated is not None:
+                    cv2.rectangle(annotated, (x, y), (x + w, y + h), (0, 0, 255), 2)  # Red for table borders
 
-        info  = extract_information(cell_text)
-        
-        info['item_name'] = match_document_name(black_cell_text)
+                black_texts.append(read_header_roi(header_image[y:y+h, x:x+w]))
+                black_boxes.append(page_box(x, y, w, h))
+
+        if annotated is not None:
+            cv2.imwrite(str(debug_path), annotated)
+
+        if regions is not None:
+            regions['yellow'] = yellow_boxes
+            regions['black'] = black_boxes
 
-        return info
+        return header_info_from_texts(yellow_texts, black_texts)
     
     if not yellow_detected:
         return extract_information(cell_text)
@@ -626,8 +726,8 @@ def detect_barcode(image_path):
 
     _, thresh = cv2.threshold(image, 150, 255, cv2.THRESH_BINARY_INV)
 
-    ocr_result = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-    print(ocr_result)
+    ocr_result = image_to_data(image)
+    logger.debug("%s", ocr_result)
 
     confidence_scores = ocr_result['conf']
 
@@ -641,10 +741,7 @@ def detect_barcode(image_path):
             extracted_data['supply'] = text[i + 2]
             extracted_data['supply_valid'] = confidence_scores[i + 2] > 70
 
-    print('text: ', text)
-    print("Extracted Data:")
-    for key, value in extracted_data.items():
-        print(f"{key} No.: {value}")
+    logger.debug("text: %s, extracted data: %s", text, extracted_data)
 
     barcode = ''
     if extracted_data['machine_valid']:
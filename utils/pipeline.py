@@ -0,0 +1,403 @@
+import logging
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from threading import Lock
+from utils.convert import render_page, get_poppler_path, BASE_DPI
+from utils.file import sanitize_file_name, log_result, process_file, remove_placeholder
+from utils.journal import get_job_journal, EXTRACTED, COMMITTING, COMMITTED
+from utils.cache import get_result_cache, file_hash
+
+logger = logging.getLogger(__name__)
+
+# env
+LOW_DPI      = int(os.getenv('LOW_DPI', 150))
+ADAPTIVE_DPI = int(os.getenv('ADAPTIVE_DPI', 1))
+MAX_RETRIES  = 3
+
+# bump when extraction changes so cached results of older versions are not reused
+PIPELINE_VERSION = "2"
+
+# settings that change what extraction returns, a change of any of them misses the cache
+EXTRACTION_SETTINGS = ("LOW_DPI", "ADAPTIVE_DPI", "RENDER_MODE", "HEADER_HEIGHT", "SHARPNESS", "TEXT_PADDING",
+                       "CROP_WIDTH", "CROP_HEIGHT", "MIN_CELL_WIDTH", "MIN_CELL_HEIGHT", "CELL_OCR_MODE",
+                       "OCR_LANG", "HEADER_TEMPLATES", "TEMPLATE_MATCH")
+settings_digest = hashlib.sha1(
+    json.dumps({name: os.getenv(name) for name in EXTRACTION_SETTINGS}, sort_keys=True).encode()
+).hexdigest()[:12]
+CACHE_VERSION = f"{PIPELINE_VERSION}-{settings_digest}"
+
+# only these keys are cached, the rest describe one run of one file
+CACHED_KEYS = ("status", "extracted_data", "doc_type", "error_message", "dpi", "escalated", "low_dpi_errors")
+
+home_dir = Path.home()
+render_stats_file = home_dir / "OCRHeader" / "render_stats.json"
+
+render_stats_lock = Lock()
+
+
+def get_render_dpis():
+    """DPIs to try in order, the low DPI is skipped when adaptive rendering is off."""
+    if ADAPTIVE_DPI and 0 < LOW_DPI < BASE_DPI:
+        return [LOW_DPI, BASE_DPI]
+    return [BASE_DPI]
+
+def extract_from_image(image, dpi=BASE_DPI, debug_path=None, source=""):
+    """
+    Classify the rendered page and extract its header fields.
+
+    Pages matching a known header template only have the template's field
+    regions read. When that result fails validation, or no template matches,
+    the header is detected as before and a successful detection is learned
+    as a new template.
+
+    Returns:
+        tuple: (extracted_data, doc_type)
+    """
+    # OCR dependencies load on the first extraction, not when the module is imported
+    from utils.ocr import extract_specific_texts, detect_table_in_image, classify_document_type
+    from utils.templates import get_registry, header_fingerprint, extract_with_template, learn_template
+
+    scale = dpi / BASE_DPI
+    registry = get_registry()
+    fingerprint = None
+    template = None
+
+    if registry is not None:
+        fingerprint = header_fingerprint(image, scale)
+        template, score = registry.match(fingerprint)
+        if template is not None:
+            extracted_data, doc_type = extract_with_template(image, template, scale)
+            # validate a copy, the caller validates the returned data itself
+            status, errors = validate_extracted_data(dict(extracted_data), doc_type)
+            if status:
+                logger.debug("Template %s (%.2f): %s", template['name'], score, extracted_data)
+                return extracted_data, doc_type
+            logger.debug("Template %s failed (%s), detecting header", template['name'], errors)
+
+    regions = {}
+    extracted_texts = None
+
+    # need detect this which type it is
+    doc_type = classify_document_type(image, debug_path=debug_path, scale=scale, regions=regions)
+
+    # if type = 1 -> process normally
+    # if 2,3 need skip below
+    if doc_type['type'] == 1:
+        extracted_texts = detect_table_in_image(image, debug_path=debug_path, scale=scale)
+        extracted_data = extract_specific_texts(extracted_texts)
+        extracted_data['type'] = 1
+    else:
+        extracted_data = doc_type
+        logger.debug("Extract Text: %s", extracted_data)
+
+    # a failed template match means the layout is already known
+    if fingerprint is not None and template is None:
+        status, _ = validate_extracted_data(dict(extracted_data), doc_type)
+        if status:
+            try:
+                learn_template(fingerprint, scale, doc_type, extracted_texts, extracted_data, regions, source)
+            except Exception as e:
+                logger.warning("Cannot save header template: %s", e)
+
+    return extracted_data, doc_type
+
+def validate_extracted_data(extracted_data, doc_type):
+    """
+    Check and sanitize the extracted fields in place.
+
+    Returns:
+        tuple: (status, errors) where errors is a list of messages, a missing date
+        is reported but does not fail the document.
+    """
+    status = True
+    errors = []
+
+    if not extracted_data.get("document_id") or len(extracted_data["document_id"]) < 14:
+        if doc_type['type'] == 1:
+            status = False
+            errors.append("Cannot get document ID")
+    else:
+        extracted_data['document_id'] = sanitize_file_name(extracted_data.get("document_id"))
+
+    if not extracted_data.get("date"):
+        # status = False
+        extracted_data['date'] = ''
+        errors.append("Cannot get date")
+    else:
+        extracted_data['date'] = sanitize_file_name(extracted_data.get("date"))
+
+    if not extracted_data.get("item_name"):
+        status = False
+        errors.append("Cannot get document header")
+    else:
+        extracted_data['item_name'] = sanitize_file_name(extracted_data.get("item_name"))
+
+    return status, errors
+
+def extract_pdf(pdf_path, poppler_path=None, timeout=10, debug_path=None, image=None):
+    """
+    Render and extract one PDF, trying LOW_DPI first and escalating to 300 DPI
+    only when the low DPI result fails validation. image is the page already
+    rendered at the first DPI of get_render_dpis(), if a render stage did that.
+
+    Returns:
+        dict: pdf_path, status, extracted_data, doc_type, error_message, dpi,
+        escalated, low_dpi_errors (the failed checks that caused escalation)
+        and timings (seconds spent in 'render' and 'ocr').
+    """
+    dpis = get_render_dpis()
+    low_dpi_errors = []
+    timings = {"render": 0.0, "ocr": 0.0}
+
+    for attempt, dpi in enumerate(dpis):
+        if attempt > 0 or image is None:
+            started = time.perf_counter()
+            image = render_page(pdf_path, poppler_path, dpi=dpi, timeout=timeout)
+            timings["render"] += time.perf_counter() - started
+
+        if debug_path:
+            import cv2
+            cv2.imwrite(str(debug_path), image)
+
+        started = time.perf_counter()
+        extracted_data, doc_type = extract_from_image(image, dpi, debug_path=debug_path, source=pdf_path)
+        status, errors = validate_extracted_data(extracted_data, doc_type)
+        timings["ocr"] += time.perf_counter() - started
+
+        if not errors or attempt == len(dpis) - 1:
+            break
+        low_dpi_errors = errors
+
+    return {
+        "pdf_path": pdf_path,
+        "status": status,
+        "extracted_data": extracted_data,
+        "doc_type": doc_type,
+        "error_message": "; ".join(errors) if errors else "",
+        "dpi": dpi,
+        "escalated": attempt > 0,
+        "low_dpi_errors": low_dpi_errors,
+        "timings": timings,
+    }
+
+def describe_error(error):
+    """Turn an exception raised while processing a PDF into the message shown to users."""
+    error_message = str(error)
+    if "Couldn't find trailer dictionary" in error_message or "Couldn't read xref table" in error_message:
+        return "PDF is corrupted or unable to open the file or this file is not a pdf file."
+    return "An error occurred during processing."
+
+def failed_result(pdf_path, error_message, retries=0):
+    """Result of a PDF that could not be rendered or extracted."""
+    return {
+        "pdf_path": pdf_path,
+        "status": False,
+        "extracted_data": {"document_id": "", "error_message": error_message, 'item_name': ''},
+        "doc_type": None,
+        "error_message": error_message,
+        "dpi": None,
+        "escalated": False,
+        "low_dpi_errors": [],
+        "retries": retries,
+        "exception": True,
+    }
+
+def get_cached_result(pdf_path):
+    """
+    Look the PDF up in the result cache by content hash.
+
+    Returns:
+        tuple: (digest, result), result is None on a miss and digest is None
+        when the cache is off or unavailable.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return None, None
+
+    try:
+        digest = file_hash(pdf_path)
+        cached = cache.get(digest, CACHE_VERSION)
+    except Exception as e:
+        logger.warning("Result cache unavailable for %s: %s", pdf_path, e)
+        return None, None
+
+    if cached is None:
+        return digest, None
+
+    cached.update({"pdf_path": pdf_path, "retries": 0, "exception": False, "cached": True})
+    return digest, cached
+
+def store_cached_result(digest, result):
+    """
+    Save a successful extraction result under the content hash of its PDF.
+    Failures are not cached, a file put back from the Failed folder is read again.
+    """
+    cache = get_result_cache()
+    if cache is None or digest is None or result.get("exception") or not result.get("status"):
+        return
+    try:
+        cache.put(digest, CACHE_VERSION, {key: result[key] for key in CACHED_KEYS})
+    except Exception as e:
+        logger.warning("Cannot cache result of %s: %s", result['pdf_path'], e)
+
+def process_pdf(pdf_path, poppler_path=None, timeout=10, max_retries=MAX_RETRIES, debug_path=None, use_cache=True):
+    """
+    Extract one PDF, retrying when poppler times out. Never raises and has no
+    folder side effects, so it can run in a worker process or be used as a
+    library function without Qt.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        poppler_path (str): Folder containing pdftoppm, defaults to get_poppler_path().
+        use_cache (bool): Return the stored result of a PDF with the same content.
+
+    Returns:
+        dict: The extract_pdf result plus retries, or a failed result.
+    """
+    if poppler_path is None:
+        poppler_path = get_poppler_path()
+
+    digest = None
+    if use_cache:
+        digest, cached = get_cached_result(pdf_path)
+        if cached is not None:
+            return cached
+
+    retries = 0
+    while retries < max_retries:
+        try:
+            result = extract_pdf(pdf_path, poppler_path, timeout=timeout, debug_path=debug_path)
+            result["retries"] = retries
+            result["exception"] = False
+            store_cached_result(digest, result)
+            return result
+        except TimeoutError:
+            retries += 1
+        except Exception as e:
+            logger.error("Error processing %s: %s", pdf_path, e)
+            return failed_result(pdf_path, describe_error(e), retries)
+
+    return failed_result(pdf_path, "PDF to image conversion timed out.", retries)
+
+def commit_result(result, success_folder, failed_folder, backup_folder, log_file):
+    """Log the result and move the PDF to the Success/Backup or Failed folder."""
+    pdf_path = result["pdf_path"]
+    extracted_data = result["extracted_data"]
+    journal = get_job_journal()
+    # saved before anything moves, an interrupted commit is redone from it
+    journal.set_state(pdf_path, EXTRACTED, result=result)
+
+    timings = dict(result.get("timings") or {})
+    started = time.perf_counter()
+    try:
+        if result["doc_type"] is not None:
+            process_file(result["status"], pdf_path, extracted_data, success_folder, failed_folder, backup_folder, log_file, doc_type=result["doc_type"])
+        else:
+            process_file(False, pdf_path, extracted_data, success_folder, failed_folder, backup_folder, log_file)
+    finally:
+        timings["commit"] = time.perf_counter() - started
+        log_result(pdf_path, extracted_data, result["status"], result["error_message"],
+                   timings=timings, dpi=result.get("dpi"), cached=result.get("cached", False))
+
+    # process_file logs its errors instead of raising, a PDF still in the data
+    # folder was not committed and is done again on the next start
+    if os.path.exists(pdf_path):
+        logger.warning("Commit of %s did not finish, it is retried on the next start", pdf_path)
+    else:
+        journal.set_state(pdf_path, COMMITTED)
+
+    # after the commit, the stats must never hold a file back
+    if not result["exception"] and not result.get("cached"):
+        try:
+            record_render_stats(result)
+        except Exception as e:
+            logger.warning("Cannot update %s: %s", render_stats_file, e)
+
+def resume_jobs(success_folder, failed_folder, backup_folder, log_file):
+    """
+    Finish the jobs an earlier run left unfinished, see utils/journal.py.
+
+    A commit that was interrupted while the PDF was still in the data folder
+    is rolled back (its Success link or placeholder and its Backup
+    placeholder are removed, see remove_success_file) and done again from the
+    saved result, as are extracted files that were not committed yet, after
+    removing a Success placeholder they claimed. A commit whose PDF already
+    left the data folder had finished moving it. Files that were only queued
+    or being rendered are returned, to be processed again.
+
+    Returns:
+        list: PDF paths that still need OCR.
+    """
+    journal = get_job_journal()
+    journal.prune()
+
+    pending = []
+    for job in journal.unfinished():
+        pdf_path = job["pdf_path"]
+        if not os.path.exists(pdf_path):
+            if job["state"] == COMMITTING:
+                journal.set_state(pdf_path, COMMITTED)
+            else:
+                # removed from the data folder since
+                journal.remove(pdf_path)
+            continue
+
+        if job["state"] == COMMITTING:
+            if job["success_path"]:
+                remove_success_file(job["success_path"], pdf_path)
+            if job["backup_path"]:
+                remove_placeholder(job["backup_path"])
+        elif job["state"] == EXTRACTED and job["success_path"]:
+            # saved just before the placeholder was created, it may not exist
+            remove_placeholder(job["success_path"])
+
+        if job["state"] in (EXTRACTED, COMMITTING) and job["result"]:
+            logger.info("Resuming the commit of %s", pdf_path)
+            commit_result(job["result"], success_folder, failed_folder, backup_folder, log_file)
+        else:
+            pending.append(pdf_path)
+
+    return pending
+
+def remove_success_file(success_path, pdf_path):
+    """
+    Remove the Success file of an interrupted commit: a hard link to the PDF
+    or a placeholder still empty. Anything else may be another file that got
+    the name since, or a finished copy, and is left alone.
+    """
+    try:
+        if os.path.samefile(success_path, pdf_path) or os.path.getsize(success_path) == 0:
+            os.remove(success_path)
+        else:
+            logger.warning("Not removing %s, it is not the interrupted copy of %s", success_path, pdf_path)
+    except FileNotFoundError:
+        pass
+
+def record_render_stats(result):
+    """
+    Add the DPI outcome of one document to the counters in render_stats.json,
+    used to tune LOW_DPI and the escalation checks.
+    """
+    with render_stats_lock:
+        try:
+            with open(render_stats_file, "r", encoding="utf-8") as file:
+                stats = json.load(file)
+        except (FileNotFoundError, ValueError):
+            stats = {}
+
+        stats["documents"] = stats.get("documents", 0) + 1
+        if result.get("escalated"):
+            stats["escalated"] = stats.get("escalated", 0) + 1
+            reasons = stats.setdefault("escalation_reasons", {})
+            for reason in result.get("low_dpi_errors", []):
+                reasons[reason] = reasons.get(reason, 0) + 1
+        elif result.get("dpi", BASE_DPI) < BASE_DPI:
+            stats["low_dpi_success"] = stats.get("low_dpi_success", 0) + 1
+        stats["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        os.makedirs(render_stats_file.parent, exist_ok=True)
+        with open(render_stats_file, "w", encoding="utf-8") as file:
+            json.dump(stats, file, indent=2)
@@ -0,0 +1,179 @@
+import io
+import os
+import csv
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from utils.store import get_result_store
+
+home_dir = Path.home()
+result_folder = home_dir / "OCRHeader" / "result_log"
+
+# parsed days kept in memory
+MAX_CACHED_DAYS = 7
+
+# column of the status in the result CSV
+STATUS_COLUMN = 3
+
+result_logs = OrderedDict()
+result_logs_lock = Lock()
+
+# (date_str, status) -> (legacy rows, stored rows, both), for days with both
+merged_rows = {}
+merged_rows_lock = Lock()
+
+
+class StoredResults:
+    """
+    Rows of one day from the result store, in the column order of the CSV log.
+    The cache is refreshed when the highest row id of the day grows, and then
+    only the new rows are read. Filtered row lists are cached per status.
+    """
+
+    def __init__(self, day):
+        self.day = day
+        self.rows = []
+        self.by_status = {}
+        self.last_id = 0
+        self.lock = Lock()
+
+    def refresh(self):
+        store = get_result_store()
+        if store.last_id(self.day) == self.last_id:
+            return
+        new_rows = store.query(self.day, after_id=self.last_id)
+        if new_rows:
+            self.last_id = new_rows[-1][0]
+            # a new list, models may still hold the old one
+            self.rows = self.rows + [row[1:] for row in new_rows]
+            self.by_status = {}
+
+    def get_rows(self, status=None):
+        """Rows of the day, only those with this status ('Success' or 'Failed') if given."""
+        with self.lock:
+            self.refresh()
+            if status is None:
+                return self.rows
+            if status not in self.by_status:
+                self.by_status[status] = [row for row in self.rows if row[STATUS_COLUMN] == status]
+            return self.by_status[status]
+
+
+class ResultLog:
+    """
+    Parsed rows of one daily result CSV, written before results moved to the
+    result store. The file is only appended to, so when it grows only the new
+    bytes are parsed. Filtered row lists are cached per status until the file
+    changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = []
+        self.by_status = {}
+        self.offset = 0
+        self.stamp = None
+        self.lock = Lock()
+
+    def refresh(self):
+        """Parse what was appended since the last call, start over if the file was replaced."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.rows, self.by_status, self.offset, self.stamp = [], {}, 0, None
+            return
+
+        stamp = (stat.st_mtime, stat.st_size)
+        if stamp == self.stamp:
+            return
+
+        if stat.st_size < self.offset:
+            self.rows, self.offset = [], 0
+
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            data = file.read()
+
+        # a row being written has no line end yet, leave it for the next refresh
+        end = data.rfind(b"\n") + 1
+        if end:
+            text = data[:end].decode("utf-8", errors="replace")
+            new_rows = list(csv.reader(io.StringIO(text, newline="")))
+            if self.offset == 0 and new_rows:
+                # header
+                new_rows = new_rows[1:]
+            # a new list, models may still hold the old one
+            self.rows = self.rows + new_rows
+            self.offset += end
+            self.by_status = {}
+
+        self.stamp = stamp
+
+    def get_rows(self, status=None):
+        """Rows of the day, only those with this status ('Success' or 'Failed') if given."""
+        with self.lock:
+            self.refresh()
+            if status is None:
+                return self.rows
+            if status not in self.by_status:
+                self.by_status[status] = [row for row in self.rows if len(row) > STATUS_COLUMN and row[STATUS_COLUMN] == status]
+            return self.by_status[status]
+
+
+def day_sources(results_folder, date_str):
+    """StoredResults of a day and the ResultLog of its CSV, None when the day has no CSV."""
+    path = os.path.join(results_folder, f"result_log_{date_str}.csv")
+    with result_logs_lock:
+        stored = result_logs.get(date_str)
+        if stored is None:
+            stored = result_logs[date_str] = StoredResults(date_str)
+        result_logs.move_to_end(date_str)
+
+        legacy = None
+        if os.path.exists(path):
+            legacy = result_logs.get(path)
+            if legacy is None:
+                legacy = result_logs[path] = ResultLog(path)
+            result_logs.move_to_end(path)
+
+        while len(result_logs) > MAX_CACHED_DAYS:
+            result_logs.popitem(last=False)
+
+    return stored, legacy
+
+
+def get_result_rows(results_folder, date_str, status=None):
+    """
+    Rows of a day filtered by status, from result_log_{date_str}.csv, written
+    before the result store, and then from the store; on the day of the
+    upgrade both have rows. Parsed days are kept for the last MAX_CACHED_DAYS
+    days asked for.
+    """
+    stored, legacy = day_sources(results_folder, date_str)
+    stored_rows = stored.get_rows(status)
+    if legacy is None:
+        return stored_rows
+    legacy_rows = legacy.get_rows(status)
+    if not stored_rows:
+        return legacy_rows
+    if not legacy_rows:
+        return stored_rows
+
+    # both only grow by new lists, the merged list is made again when one changes
+    with merged_rows_lock:
+        cached = merged_rows.get((date_str, status))
+        if cached is None or cached[0] is not legacy_rows or cached[1] is not stored_rows:
+            if len(merged_rows) > MAX_CACHED_DAYS * 3:
+                merged_rows.clear()
+            cached = merged_rows[(date_str, status)] = (legacy_rows, stored_rows, legacy_rows + stored_rows)
+        return cached[2]
+
+
+def export_result_rows(results_folder, date_str, csv_path):
+    """
+    Write the results of a day as CSV like ResultStore.export_csv, the rows
+    of the day's CSV log first. Returns the number of rows.
+    """
+    _, legacy = day_sources(results_folder, date_str)
+    legacy_rows = legacy.get_rows() if legacy is not None else []
+    return get_result_store().export_csv(date_str, csv_path, leading_rows=legacy_rows)
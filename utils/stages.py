@@ -0,0 +1,113 @@
+import os
+import queue
+import threading
+
+# env
+STAGE_QUEUE_SIZE = int(os.getenv('STAGE_QUEUE_SIZE', 4))
+
+STOP = object()
+
+
+class StagedPipeline:
+    """
+    Run jobs through stages that overlap in time. Each stage has its own worker
+    threads and a bounded input queue, so a slow stage holds back the stages
+    before it instead of letting work pile up in memory.
+
+    A job is a dict passed from stage to stage. When a stage raises, the error
+    is stored in job['error'] and the job goes straight to the last stage,
+    which is always called so it can report the failure.
+    """
+
+    def __init__(self, stages, queue_size=STAGE_QUEUE_SIZE, dropped=None):
+        """
+        Args:
+            stages (list[tuple]): (name, function, worker_count) in order, function(job) updates the job.
+            queue_size (int): Maximum number of jobs waiting in front of each stage.
+            dropped (callable): Called with each job that stop() drops before its last stage.
+        """
+        self.stages = stages
+        self.dropped = dropped
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.busy = [0] * len(stages)
+        self.busy_lock = threading.Lock()
+        self.running = True
+        self.threads = []
+
+        for index, (name, function, worker_count) in enumerate(stages):
+            stage_threads = []
+            for number in range(max(1, worker_count)):
+                thread = threading.Thread(target=self.run_stage, args=(index,), name=f"{name}-{number + 1}", daemon=True)
+                thread.start()
+                stage_threads.append(thread)
+            self.threads.append(stage_threads)
+
+    def submit(self, job):
+        """Queue a job for the first stage, blocks while that queue is full."""
+        self.queues[0].put(job)
+
+    def run_stage(self, index):
+        name, function, _ = self.stages[index]
+        last = index == len(self.stages) - 1
+
+        while True:
+            job = self.queues[index].get()
+            if job is STOP:
+                break
+            if not self.running:
+                self.drop(job)
+                continue
+
+            with self.busy_lock:
+                self.busy[index] += 1
+            try:
+                if last or 'error' not in job:
+                    function(job)
+            except Exception as e:
+                job['error'] = e
+            finally:
+                with self.busy_lock:
+                    self.busy[index] -= 1
+
+            if not last:
+                target = len(self.queues) - 1 if 'error' in job else index + 1
+                self.queues[target].put(job)
+
+    def queue_depths(self):
+        """Jobs waiting for and running in each stage, e.g. {'ocr': {'queued': 3, 'busy': 4}}."""
+        with self.busy_lock:
+            return {
+                name: {"queued": self.queues[index].qsize(), "busy": self.busy[index]}
+                for index, (name, _, _) in enumerate(self.stages)
+            }
+
+    def close(self, wait=True):
+        """Finish the queued jobs, then stop the worker threads stage by stage."""
+        def shutdown():
+            for index, stage_threads in enumerate(self.threads):
+                for _ in stage_threads:
+                    self.queues[index].put(STOP)
+                for thread in stage_threads:
+                    thread.join()
+
+        if wait:
+            shutdown()
+        else:
+            threading.Thread(target=shutdown, daemon=True).start()
+
+    def drop(self, job):
+        if self.dropped is not None:
+            self.dropped(job)
+
+    def stop(self):
+        """Drop jobs that have not been committed yet and stop the worker threads."""
+        self.running = False
+        for jobs in self.queues:
+            while True:
+                try:
+                    job = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not STOP:
+                    self.drop(job)
+        self.close(wait=False)
@@ -0,0 +1,54 @@
+import os
+import json
+import time
+from pathlib import Path
+
+# imported first by main.py and cli.py, so this is close to the process start
+started = time.perf_counter()
+started_at = time.strftime("%Y-%m-%d %H:%M:%S")
+
+home_dir = Path.home()
+benchmark_file = home_dir / "OCRHeader" / "startup_benchmark.json"
+
+# keep the timings of this many runs
+MAX_RUNS = 50
+
+marks = {}
+
+
+def mark(event):
+    """
+    Record the seconds from start to the first time event happens, e.g.
+    'first_window' or 'first_file'. With STARTUP_BENCHMARK=1 the timing is
+    printed and saved to startup_benchmark.json.
+    """
+    if event in marks:
+        return
+    marks[event] = round(time.perf_counter() - started, 3)
+
+    # read here and not at import, .env is loaded after this module
+    if not int(os.getenv('STARTUP_BENCHMARK', 0)):
+        return
+
+    print(f"Startup: {event} after {marks[event]:.2f} s")
+    try:
+        save_marks()
+    except Exception as e:
+        print(f"Cannot save startup benchmark: {e}")
+
+def save_marks():
+    """Store the marks of this run next to the ones of earlier runs."""
+    try:
+        with open(benchmark_file, "r", encoding="utf-8") as file:
+            runs = json.load(file)
+    except (FileNotFoundError, ValueError):
+        runs = []
+
+    if runs and runs[-1].get("started") == started_at and runs[-1].get("pid") == os.getpid():
+        runs[-1]["marks"] = marks
+    else:
+        runs.append({"started": started_at, "pid": os.getpid(), "marks": marks})
+
+    os.makedirs(benchmark_file.parent, exist_ok=True)
+    with open(benchmark_file, "w", encoding="utf-8") as file:
+        json.dump(runs[-MAX_RUNS:], file, indent=2)
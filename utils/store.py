@@ -0,0 +1,203 @@
+import logging
+import os
+import csv
+import json
+import queue
+import atexit
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# env
+# results are written in one transaction per batch of up to this many rows
+RESULT_BATCH_SIZE = int(os.getenv('RESULT_BATCH_SIZE', 100))
+
+home_dir = Path.home()
+results_file = home_dir / "OCRHeader" / "results.db"
+
+# wait this long for more results before writing a batch (seconds)
+BATCH_WAIT = 0.2
+
+# columns of the daily CSV, the first six are the ones the CSV log always had
+CSV_COLUMNS = ["file_name", "new_file_name", "extracted_data", "status", "error_message", "date_processed",
+               "document_id", "item_name", "date", "type", "barcode", "dpi", "cached", "render_ms", "ocr_ms", "commit_ms"]
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY,
+        day TEXT NOT NULL,
+        processed_at TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        new_file_name TEXT NOT NULL,
+        document_id TEXT,
+        item_name TEXT,
+        date TEXT,
+        type INTEGER,
+        barcode TEXT,
+        status TEXT NOT NULL,
+        error TEXT,
+        dpi INTEGER,
+        cached INTEGER NOT NULL DEFAULT 0,
+        render_ms REAL,
+        ocr_ms REAL,
+        commit_ms REAL,
+        extracted_data TEXT
+    );
+    CREATE INDEX IF NOT EXISTS results_day_status ON results (day, status);
+    CREATE INDEX IF NOT EXISTS results_document_id ON results (document_id);
+"""
+
+INSERT_COLUMNS = ("day", "processed_at", "file_name", "new_file_name", "document_id", "item_name", "date", "type",
+                  "barcode", "status", "error", "dpi", "cached", "render_ms", "ocr_ms", "commit_ms", "extracted_data")
+
+result_store = None
+result_store_lock = threading.Lock()
+
+
+class ResultStore:
+    """
+    Results of processed files in SQLite. add() only queues the result, a
+    writer thread inserts the queue in batches, one transaction per batch.
+    Readers use their own connection per thread, WAL lets them read while
+    the writer writes.
+    """
+
+    def __init__(self, path=results_file, batch_size=RESULT_BATCH_SIZE):
+        os.makedirs(Path(path).parent, exist_ok=True)
+        self.path = str(path)
+        self.batch_size = max(1, batch_size)
+        self.local = threading.local()
+        self.pending = queue.Queue()
+
+        connection = self.connect()
+        connection.executescript(SCHEMA)
+        connection.commit()
+
+        self.writer = threading.Thread(target=self.write_loop, name="result-store", daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        """Connection of the calling thread."""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def add(self, record):
+        """Queue a record made by result_record()."""
+        self.pending.put(record)
+
+    def flush(self, timeout=10):
+        """Wait until everything queued so far is written."""
+        done = threading.Event()
+        self.pending.put(done)
+        return done.wait(timeout)
+
+    def write_loop(self):
+        connection = self.connect()
+        while True:
+            batch = [self.pending.get()]
+            # collect what arrives shortly after, parallel workers finish close together
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.pending.get(timeout=BATCH_WAIT))
+                except queue.Empty:
+                    break
+
+            records = [item for item in batch if isinstance(item, dict)]
+            if records:
+                try:
+                    with connection:
+                        connection.executemany(
+                            f"INSERT INTO results ({', '.join(INSERT_COLUMNS)}) VALUES ({', '.join('?' * len(INSERT_COLUMNS))})",
+                            [tuple(record.get(column) for column in INSERT_COLUMNS) for record in records],
+                        )
+                except sqlite3.Error as e:
+                    logger.error("Cannot write %d result(s) to %s: %s", len(records), self.path, e)
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def last_id(self, day):
+        """Highest row id of the day, 0 when there are none. Grows when results are added."""
+        row = self.connect().execute("SELECT MAX(id) FROM results WHERE day = ?", (day,)).fetchone()
+        return row[0] or 0
+
+    def query(self, day, status=None, after_id=0):
+        """
+        Rows of a day in the column order of the CSV log:
+        (id, file_name, new_file_name, extracted_data, status, error, processed_at).
+        """
+        sql = ("SELECT id, file_name, new_file_name, extracted_data, status, error, processed_at "
+               "FROM results WHERE day = ? AND id > ?")
+        args = [day, after_id]
+        if status:
+            sql += " AND status = ?"
+            args.append(status)
+        return self.connect().execute(sql + " ORDER BY id", args).fetchall()
+
+    def export_csv(self, day, csv_path, leading_rows=()):
+        """
+        Write the results of a day as CSV, after leading_rows, e.g. the rows of
+        the day's CSV log from before the store, padded to CSV_COLUMNS.
+        Returns the number of rows.
+        """
+        rows = self.connect().execute(
+            "SELECT file_name, new_file_name, extracted_data, status, error, processed_at, document_id, item_name, "
+            "date, type, barcode, dpi, cached, render_ms, ocr_ms, commit_ms FROM results WHERE day = ? ORDER BY id",
+            (day,),
+        ).fetchall()
+        with open(csv_path, "w", newline="", encoding="utf-8") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(CSV_COLUMNS)
+            leading_rows = [list(row) + [""] * (len(CSV_COLUMNS) - len(row)) for row in leading_rows]
+            writer.writerows(leading_rows)
+            writer.writerows(rows)
+        return len(leading_rows) + len(rows)
+
+
+def result_record(file_path, extracted_data, status, error_message=None, new_file_name="", timings=None, dpi=None, cached=False):
+    """Turn one result into the row stored by ResultStore."""
+    now = datetime.now()
+    extracted_data = extracted_data or {}
+    timings = timings or {}
+
+    def ms(stage):
+        return round(timings[stage] * 1000, 1) if stage in timings else None
+
+    return {
+        "day": now.strftime("%Y-%m-%d"),
+        "processed_at": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "file_name": os.path.basename(file_path),
+        "new_file_name": new_file_name,
+        "document_id": extracted_data.get("document_id") or None,
+        "item_name": extracted_data.get("item_name") or None,
+        "date": extracted_data.get("date") or None,
+        "type": extracted_data.get("type"),
+        "barcode": extracted_data.get("barcode") or None,
+        "status": "Success" if status else "Failed",
+        "error": error_message if not status else "",
+        "dpi": dpi,
+        "cached": int(bool(cached)),
+        "render_ms": ms("render"),
+        "ocr_ms": ms("ocr"),
+        "commit_ms": ms("commit"),
+        "extracted_data": json.dumps(extracted_data, ensure_ascii=False, default=str),
+    }
+
+def get_result_store():
+    """The store of this process, opened on first use."""
+    global result_store
+    with result_store_lock:
+        if result_store is None:
+            result_store = ResultStore()
+            # write what is still queued when the application exits
+            atexit.register(result_store.flush)
+    return result_store
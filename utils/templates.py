@@ -0,0 +1,260 @@
+import logging
+import os
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+import cv2
+import numpy as np
+from utils.ocr import extract_specific_texts, header_info_from_texts, read_header_roi, scale_box, scale_px
+from utils.engine import image_to_string
+from utils.convert import HEADER_HEIGHT
+
+logger = logging.getLogger(__name__)
+
+# env
+HEADER_TEMPLATES = int(os.getenv('HEADER_TEMPLATES', 1))
+# minimum fingerprint similarity (-1..1) to use a template
+TEMPLATE_MATCH   = float(os.getenv('TEMPLATE_MATCH', 0.9))
+
+home_dir = Path.home()
+template_file = home_dir / "OCRHeader" / "templates.json"
+
+# projections are resampled to this many values
+FINGERPRINT_SIZE = 64
+# the header is shrunk to this width before looking for lines
+FINGERPRINT_WIDTH = 512
+
+# a template stores the fields of one header layout, e.g.
+# {"name": "table-1", "type": 1, "fingerprint": {"rows": [...], "cols": [...]},
+#  "fields": {"document_id": [x, y, w, h], "item_name": [...], "date": [...]}}
+# type 3 (yellow barcode) templates store {"yellow": [boxes], "black": [boxes]} as fields.
+# Boxes are page coordinates at 300 DPI.
+
+registry = None
+registry_lock = Lock()
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import fcntl
+
+
+def resample(values, size=FINGERPRINT_SIZE):
+    """Resample a projection to a fixed length and normalize it for correlation."""
+    values = np.interp(np.linspace(0, len(values) - 1, size), np.arange(len(values)), values)
+    values = values - values.mean()
+    norm = np.linalg.norm(values)
+    return values / norm if norm else values
+
+def header_fingerprint(image, scale=1.0):
+    """
+    Cheap layout fingerprint of the header: where the horizontal and vertical
+    table lines are, as row and column projections of a downsampled line mask.
+    """
+    header = image[:scale_px(HEADER_HEIGHT, scale)]
+    height, width = header.shape[:2]
+    small_height = max(1, int(height * FINGERPRINT_WIDTH / width))
+    small = cv2.resize(cv2.cvtColor(header, cv2.COLOR_BGR2GRAY), (FINGERPRINT_WIDTH, small_height), interpolation=cv2.INTER_AREA)
+
+    _, binary = cv2.threshold(small, 150, 255, cv2.THRESH_BINARY_INV)
+    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 1)))
+    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, 15)))
+
+    return {
+        "rows": resample(horizontal.mean(axis=1)),
+        "cols": resample(vertical.mean(axis=0)),
+    }
+
+def similarity(fingerprint, other):
+    """Correlation of two fingerprints, 1 means the same layout."""
+    rows = float(np.dot(fingerprint["rows"], np.asarray(other["rows"])))
+    cols = float(np.dot(fingerprint["cols"], np.asarray(other["cols"])))
+    return (rows + cols) / 2
+
+
+@contextmanager
+def process_lock(lock_path):
+    """Exclusive lock shared by every process, an OS file lock so it is released if the holder dies."""
+    os.makedirs(Path(lock_path).parent, exist_ok=True)
+    with open(lock_path, "a+") as lock_file:
+        if msvcrt:
+            lock_file.seek(0)
+            # LK_LOCK retries for about 10 seconds, then raises OSError
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if msvcrt:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class TemplateRegistry:
+    """Known header layouts, loaded from and saved to templates.json."""
+
+    def __init__(self, path=template_file):
+        self.path = Path(path)
+        self.lock = Lock()
+        self.templates = self.load() or []
+
+    def load(self):
+        """The saved templates, [] when there are none, None when the file cannot be read."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            # left as it is, it holds every learned template
+            logger.error("Cannot read header templates from %s: %s", self.path, e)
+            return None
+
+    def match(self, fingerprint):
+        """Return (template, score) of the closest known layout, template is None below TEMPLATE_MATCH."""
+        best, best_score = None, -1.0
+        with self.lock:
+            for template in self.templates:
+                score = similarity(fingerprint, template["fingerprint"])
+                if score > best_score:
+                    best, best_score = template, score
+        if best_score < TEMPLATE_MATCH:
+            return None, best_score
+        return best, best_score
+
+    def add(self, template):
+        """
+        Save a new template unless another process already learned the same layout.
+        The file is re-read first since every worker process has its own registry,
+        the read-modify-write runs under a lock shared by the processes.
+        """
+        with self.lock, process_lock(self.path.with_suffix(".lock")):
+            templates = self.load()
+            if templates is None:
+                return False
+            for known in templates:
+                if similarity(template["fingerprint"], known["fingerprint"]) >= TEMPLATE_MATCH:
+                    self.templates = templates
+                    return False
+
+            template["name"] = f"{'table' if template['type'] == 1 else 'barcode'}-{len(templates) + 1}"
+            template["fingerprint"] = {key: [round(float(v), 5) for v in values] for key, values in template["fingerprint"].items()}
+            templates.append(template)
+
+            os.makedirs(self.path.parent, exist_ok=True)
+            temp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(templates, file, indent=2)
+            os.replace(temp_path, self.path)
+
+            self.templates = templates
+            return True
+
+
+def get_registry():
+    """The template registry of this process, None when HEADER_TEMPLATES is off."""
+    global registry
+    if not HEADER_TEMPLATES:
+        return None
+    with registry_lock:
+        if registry is None:
+            registry = TemplateRegistry()
+    return registry
+
+def read_region(image, box, scale):
+    """OCR one stored field region of the page."""
+    x, y, w, h = scale_box(box, scale)
+    x, y = max(0, x), max(0, y)
+    return image_to_string(image[y:y + h, x:x + w], config="--psm 6 --oem 1").strip()
+
+def extract_with_template(image, template, scale=1.0):
+    """
+    OCR only the field regions of a matched template.
+
+    Returns:
+        tuple: (extracted_data, doc_type) like the detection path.
+    """
+    fields = template["fields"]
+
+    if template["type"] == 1:
+        cell_data = [
+            {"cell_number": i + 1, "coordinates": tuple(box), "text": read_region(image, box, scale)}
+            for i, box in enumerate(fields[name] for name in ("document_id", "item_name", "date") if name in fields)
+        ]
+        extracted_data = extract_specific_texts(cell_data)
+        extracted_data['type'] = 1
+        doc_type = {'document_id': '', 'date': '', 'item_name': '', 'barcode': '', 'type': 1, 'version': 'old'}
+        return extracted_data, doc_type
+
+    def read_boxes(boxes):
+        texts = []
+        for box in boxes:
+            x, y, w, h = scale_box(box, scale)
+            texts.append(read_header_roi(image[y:y + h, x:x + w]))
+        return texts
+
+    doc_type = header_info_from_texts(read_boxes(fields["yellow"]), read_boxes(fields["black"]))
+    doc_type['type'] = 3 if doc_type.get('version') == 'new' else 1
+    return doc_type, doc_type
+
+def field_regions(extracted_texts, extracted_data, scale=1.0):
+    """
+    Find the cell each field was read from: the first cell that yields the
+    same value on its own. The date is optional, the document ID and item
+    name are not. Returns {field: [x, y, w, h] at 300 DPI} or None.
+    """
+    fields = {}
+    for name in ("document_id", "item_name", "date"):
+        if not extracted_data.get(name):
+            if name == "date":
+                continue
+            return None
+        for cell in extracted_texts:
+            if not cell.get("coordinates"):
+                continue
+            if extract_specific_texts([cell]).get(name) == extracted_data[name]:
+                fields[name] = [int(round(v / scale)) for v in cell["coordinates"]]
+                break
+        else:
+            if name != "date":
+                return None
+    return fields
+
+def learn_template(fingerprint, scale, doc_type, extracted_texts=None, extracted_data=None, regions=None, source=""):
+    """
+    Add the layout of a successfully extracted page to the registry.
+    extracted_data is the data before validate_extracted_data sanitized it.
+    Type 1 pages need the cells and extracted data, type 3 pages the regions
+    filled in by classify_document_type.
+    """
+    regions = regions or {}
+    registry = get_registry()
+    if registry is None:
+        return
+
+    # old headers with a yellow barcode area are left to detection
+    if doc_type['type'] == 1 and not regions:
+        fields = field_regions(extracted_texts or [], extracted_data or {}, scale)
+    elif doc_type['type'] == 3 and regions.get('yellow') and regions.get('black'):
+        fields = {"yellow": regions['yellow'], "black": regions['black']}
+    else:
+        fields = None
+
+    if not fields:
+        return
+
+    template = {
+        "type": doc_type['type'],
+        "fingerprint": fingerprint,
+        "fields": fields,
+        "source": os.path.basename(str(source)),
+        "learned_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if registry.add(template):
+        logger.info("Learned header template %s from %s", template['name'], template['source'])
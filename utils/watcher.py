@@ -0,0 +1,219 @@
+import logging
+import os
+import time
+import threading
+
+logger = logging.getLogger(__name__)
+
+# env
+# 'auto' uses filesystem events and polls network shares, 'events' or 'poll' force one of them
+WATCH_MODE          = os.getenv('WATCH_MODE', 'auto')
+WATCH_POLL_INTERVAL = float(os.getenv('WATCH_POLL_INTERVAL', 5))
+# a new file is handed over once its size and mtime have not changed for this many seconds
+WATCH_SETTLE        = float(os.getenv('WATCH_SETTLE', 1))
+
+NETWORK_FILESYSTEMS = ("cifs", "smb3", "smbfs", "nfs", "nfs4", "fuse.sshfs", "9p")
+
+
+def is_network_path(path):
+    """True when path is on a network share, where filesystem events are unreliable."""
+    path = os.path.abspath(path)
+
+    if os.name == 'nt':
+        if path.startswith(("\\\\", "//")):
+            return True
+        try:
+            import ctypes
+            DRIVE_REMOTE = 4
+            return ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + "\\") == DRIVE_REMOTE
+        except Exception:
+            return False
+
+    # longest mount point containing the path decides
+    best_mount, best_type = "", ""
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8") as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point, fs_type = fields[1], fields[2]
+                if (path == mount_point or path.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > len(best_mount):
+                    best_mount, best_type = mount_point, fs_type
+    except OSError:
+        return False
+    return best_type in NETWORK_FILESYSTEMS
+
+
+class FolderWatcher:
+    """
+    Report files that arrive in a folder, once they are completely written.
+
+    Uses watchdog filesystem events (inotify, ReadDirectoryChangesW) when
+    available and polls the folder with os.scandir when watchdog is missing
+    or the folder is on a network share. Files already in the folder when
+    the watcher starts are reported too.
+
+    on_files(paths) is called from a background thread with a list of paths.
+    A path is reported once until it leaves the folder.
+    """
+
+    def __init__(self, folder, on_files, mode=WATCH_MODE, poll_interval=WATCH_POLL_INTERVAL, settle=WATCH_SETTLE):
+        self.folder = folder
+        self.on_files = on_files
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.settle = settle
+
+        self.lock = threading.Lock()
+        # path -> (size, mtime) at the last settle check, None before the first one
+        self.candidates = {}
+        self.reported = set()
+        self.wake = threading.Event()
+        self.running = False
+        self.observer = None
+        self.threads = []
+
+    def start(self):
+        """Start watching. Returns 'events' or 'poll', whichever is used."""
+        self.running = True
+        mode = self.mode
+        if mode == 'auto':
+            mode = 'poll' if is_network_path(self.folder) else 'events'
+        if mode == 'events' and not self.start_observer():
+            mode = 'poll'
+
+        self.scan()
+        if mode == 'poll':
+            self.start_thread(self.poll_loop, "watch-poll")
+        self.start_thread(self.settle_loop, "watch-settle")
+        return mode
+
+    def start_thread(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def start_observer(self):
+        """Subscribe to filesystem events, False when watchdog is not installed."""
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            logger.info("watchdog is not installed, polling the data folder instead.")
+            return False
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    watcher.add(event.src_path)
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    watcher.add(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    watcher.remove(event.src_path)
+                    watcher.add(event.dest_path)
+
+            def on_deleted(self, event):
+                if not event.is_directory:
+                    watcher.remove(event.src_path)
+
+        try:
+            self.observer = Observer()
+            self.observer.schedule(Handler(), self.folder, recursive=False)
+            self.observer.start()
+        except Exception as e:
+            logger.warning("Cannot watch %s for events, polling instead: %s", self.folder, e)
+            self.observer = None
+            return False
+        return True
+
+    def add(self, path):
+        """A file was created or changed, check it at the next settle round."""
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.folder):
+            return
+        with self.lock:
+            if path not in self.reported and path not in self.candidates:
+                self.candidates[path] = None
+        self.wake.set()
+
+    def remove(self, path):
+        """A file left the folder, report it again if it comes back."""
+        with self.lock:
+            self.candidates.pop(path, None)
+            self.reported.discard(path)
+
+    def scan(self):
+        """List the folder once, adding new files and forgetting the ones that are gone."""
+        try:
+            with os.scandir(self.folder) as entries:
+                paths = {entry.path for entry in entries if entry.is_file()}
+        except OSError as e:
+            logger.warning("Cannot list %s: %s", self.folder, e)
+            return
+
+        with self.lock:
+            self.reported &= paths
+            for path in list(self.candidates):
+                if path not in paths:
+                    del self.candidates[path]
+        for path in paths:
+            self.add(path)
+
+    def poll_loop(self):
+        while self.running:
+            time.sleep(self.poll_interval)
+            if self.running:
+                self.scan()
+
+    def settle_loop(self):
+        """Hand over candidates whose size and mtime stopped changing."""
+        while self.running:
+            self.wake.wait(timeout=self.settle)
+            self.wake.clear()
+            if not self.running:
+                break
+
+            ready = []
+            with self.lock:
+                candidates = list(self.candidates.items())
+
+            now = time.time()
+            for path, last in candidates:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # gone before it settled
+                    self.remove(path)
+                    continue
+
+                current = (stat.st_size, stat.st_mtime)
+                with self.lock:
+                    if path not in self.candidates:
+                        continue
+                    if current == last and now - stat.st_mtime >= self.settle:
+                        del self.candidates[path]
+                        self.reported.add(path)
+                        ready.append(path)
+                    else:
+                        self.candidates[path] = current
+
+            if ready:
+                try:
+                    self.on_files(sorted(ready))
+                except Exception as e:
+                    logger.error("Error handling new files: %s", e)
+
+    def stop(self):
+        """Stop watching, files not reported yet are dropped."""
+        self.running = False
+        self.wake.set()
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join(timeout=5)
+            self.observer = None
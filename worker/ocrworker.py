@@ -1,39 +1,69 @@
 import os
-import pytesseract
-from PyQt6.QtCore import QObject, pyqtSignal, QThreadPool
+import time
+import threading
+import concurrent.futures
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot, QThreadPool
 from datetime import datetime
-from utils.file import delete_folders
-from utils.convert import is_running_as_exe 
-from worker.ocrtask import OcrTask
-from pathlib import Path
+from utils.file import get_datetime, get_worker_count, get_debug_path
+from utils.convert import is_running_as_exe, get_poppler_path
+from utils.pipeline import process_pdf, extract_pdf, commit_result, resume_jobs, failed_result, describe_error, get_render_dpis, get_cached_result, store_cached_result, MAX_RETRIES
+from utils.convert import render_page
+from utils.journal import get_job_journal, RENDERING
+from utils.log import worker_logging
+from utils.stages import StagedPipeline
+from worker.ocrtask import OcrTask, emit_progress
 from functools import partial
 
-print('Please wait...')
+# 'process' runs extraction in a pool of worker processes, 'thread' in one QThreadPool thread,
+# 'staged' runs render, OCR and file moves as overlapping stages
+OCR_EXECUTOR = os.getenv('OCR_EXECUTOR', 'process')
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', 2))
+COMMIT_WORKERS = int(os.getenv('COMMIT_WORKERS', 1))
 
-tesseract_path = os.path.abspath('./binaries/tesseract/tesseract.exe')
-pytesseract.pytesseract.tesseract_cmd = tesseract_path
-# pytesseract.pytesseract.tesseract_cmd = os.getenv('OCR_PATH')
+process_pool = None
+process_pool_lock = threading.Lock()
 
-# image_folder   = './image'
-# result_folder  = './result_log'
-home_dir = Path.home()
-image_folder = home_dir / "OCRHeader" / "image"
-result_folder = home_dir / "OCRHeader" / "result_log"
-delete_folders(image_folder)
-os.makedirs(image_folder, exist_ok=True)
-os.makedirs(result_folder, exist_ok=True)
+
+def get_process_pool():
+    """Worker processes are started once and shared by every batch."""
+    global process_pool
+    with process_pool_lock:
+        if process_pool is None:
+            initializer, initargs = worker_logging()
+            process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=get_worker_count(), initializer=initializer, initargs=initargs)
+        return process_pool
+
+def reset_process_pool(broken_pool):
+    """
+    Drop a broken pool so the next files start fresh workers. Every future of
+    the broken pool calls this, only the first one for the pool that is still
+    current drops it, a pool started since is left alone.
+    """
+    global process_pool
+    with process_pool_lock:
+        if process_pool is not broken_pool:
+            return
+        process_pool = None
+    broken_pool.shutdown(wait=False, cancel_futures=True)
 
 class OCRWorker(QObject):
+    """
+    Dispatcher that lives for the whole OCR run. Files are handed to it with
+    add_files at any time and go straight to the executor, so workers are
+    kept busy from one queue and files found during a run join it. idle is
+    emitted whenever every file handed over so far is done.
+    """
     progress = pyqtSignal(str)
     completed = pyqtSignal(str, bool)
-    batch_completed = pyqtSignal()
+    idle = pyqtSignal()
+    queue_depths = pyqtSignal(dict)
+    # files of an interrupted run that still need OCR, see resume
+    resumed = pyqtSignal(list)
 
-    def __init__(self, batch, data_folder, success_folder, failed_folder, backup_folder, log_folder):
+    def __init__(self, data_folder, success_folder, failed_folder, backup_folder, log_folder):
         super().__init__()
 
-        self.batch = batch
-
-        self.poppler_path = os.path.abspath('./binaries/poppler/bin') if is_running_as_exe() else 'C:/poppler-24.07.0/Library/bin'
+        self.poppler_path = get_poppler_path()
 
 
         self.log_file = os.path.join(log_folder, f"{datetime.now().strftime('%Y-%m-%d')}_log.txt")
@@ -47,23 +77,61 @@ class OCRWorker(QObject):
          # Thread pool for parallel tasks
         self.thread_pool = QThreadPool()
         self.thread_pool.setMaxThreadCount(1)
+        # thread mode: pdf_path -> task not completed yet, taken back from the pool on stop
+        self.tasks = {}
+
+        # process mode: extraction runs in worker processes, file moves run here on COMMIT_WORKERS threads
+        self.futures = []
+        self.commit_pool = None
+
+        # staged mode
+        self.pipeline = None
+        self.pending_tasks = 0
+        self.pending_lock = threading.Lock()
     
     def run(self):
         """Worker initialization."""
         self.progress.emit("Worker started.")
-        self.process_file()
 
-    def process_file(self):
-        """Process the files in the batch."""
-        self.pending_tasks = len(self.batch)  # Track pending tasks
-        for pdf_path in self.batch:
+    @pyqtSlot()
+    def resume(self):
+        """Finish what the last run left unfinished, on the worker's thread, see resume_jobs."""
+        try:
+            pending = resume_jobs(self.success_folder, self.failed_folder, self.backup_folder, self.log_file)
+        except Exception as e:
+            self.progress.emit(f"Cannot resume interrupted files: {e}")
+            pending = []
+        self.resumed.emit(pending)
+
+    @pyqtSlot(list)
+    def add_files(self, pdf_files):
+        """Queue files for OCR, runs on the worker's thread."""
+        if not self._is_running or not pdf_files:
+            return
+        with self.pending_lock:
+            self.pending_tasks += len(pdf_files)
+        get_job_journal().queue(pdf_files)
+
+        if OCR_EXECUTOR == 'process':
+            self.submit_to_processes(pdf_files)
+            return
+        if OCR_EXECUTOR == 'staged':
+            self.submit_to_stages(pdf_files)
+            return
+
+        for index, pdf_path in enumerate(pdf_files):
             if not self._is_running:
                 self.progress.emit("Processing stopped.")
+                # the rest was counted in add_files but never handed over
+                self.drop_files(pdf_files[index:])
                 return
             
             task = OcrTask(pdf_path, self.success_folder, self.failed_folder, self.backup_folder, self.log_file, self._is_running, self.poppler_path)
             task.signals.progress.connect(self.progress.emit)
             task.signals.completed.connect(self.on_task_completed)
+            # kept alive here so cancel_pending can take it back
+            task.setAutoDelete(False)
+            self.tasks[pdf_path] = task
             self.thread_pool.start(task)
 
         # self.thread_pool.waitForDone()
@@ -90,16 +158,158 @@ class OCRWorker(QObject):
 
 
 
+    def submit_to_processes(self, pdf_files):
+        """Extract the files in the shared process pool."""
+        pool = get_process_pool()
+        if self.commit_pool is None:
+            self.commit_pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, COMMIT_WORKERS))
+        # finished futures are not needed for cancel_pending
+        self.futures = [future for future in self.futures if not future.done()]
+
+        for index, pdf_path in enumerate(pdf_files):
+            if not self._is_running:
+                self.progress.emit("Processing stopped.")
+                # the rest was counted in add_files but never handed over
+                self.drop_files(pdf_files[index:])
+                return
+
+            datetime_str = get_datetime()
+            debug_path = get_debug_path(datetime_str)
+
+            self.progress.emit(f"{datetime_str} - Processing: {pdf_path}")
+            future = pool.submit(process_pdf, pdf_path, self.poppler_path, 10, MAX_RETRIES, debug_path)
+            future.add_done_callback(partial(self.on_pdf_extracted, pdf_path, pool))
+            self.futures.append(future)
+
+    def on_pdf_extracted(self, pdf_path, pool, future):
+        """Called from the pool when a worker process returns, queues the file moves."""
+        if future.cancelled():
+            self.drop_files([pdf_path])
+            return
+
+        try:
+            result = future.result()
+        except concurrent.futures.process.BrokenProcessPool as e:
+            reset_process_pool(pool)
+            result = failed_result(pdf_path, describe_error(e))
+        except Exception as e:
+            result = failed_result(pdf_path, describe_error(e))
+
+        self.commit_pool.submit(self.commit, result)
+
+    def commit(self, result):
+        """Move and log one extracted file, runs on one of the COMMIT_WORKERS commit threads."""
+        emit_progress(self.progress.emit, result, get_datetime())
+        try:
+            commit_result(result, self.success_folder, self.failed_folder, self.backup_folder, self.log_file)
+        except Exception as e:
+            self.progress.emit(f"Error moving {result['pdf_path']}: {e}")
+        self.on_task_completed(result['pdf_path'], result['status'])
+
+    def submit_to_stages(self, pdf_files):
+        """Feed the files through the render, OCR and commit stages, started on first use."""
+        if self.pipeline is None:
+            self.pipeline = StagedPipeline([
+                ("render", self.render_job, RENDER_WORKERS),
+                ("ocr", self.extract_job, get_worker_count()),
+                ("commit", self.commit_job, COMMIT_WORKERS),
+            ], dropped=lambda job: self.drop_files([job['pdf_path']]))
+
+        for index, pdf_path in enumerate(pdf_files):
+            if not self._is_running:
+                self.progress.emit("Processing stopped.")
+                # the rest was counted in add_files but never handed over
+                self.drop_files(pdf_files[index:])
+                return
+
+            datetime_str = get_datetime()
+            debug_path = get_debug_path(datetime_str)
+
+            self.progress.emit(f"{datetime_str} - Processing: {pdf_path}")
+            self.pipeline.submit({"pdf_path": pdf_path, "debug_path": debug_path, "retries": 0})
+
+    def render_job(self, job):
+        """Render stage: rasterize the header at the first DPI, retrying on timeout."""
+        get_job_journal().set_state(job['pdf_path'], RENDERING)
+        job['digest'], cached = get_cached_result(job['pdf_path'])
+        if cached is not None:
+            job['result'] = cached
+            return
+
+        dpi = get_render_dpis()[0]
+        started = time.perf_counter()
+        while True:
+            try:
+                job['image'] = render_page(job['pdf_path'], self.poppler_path, dpi=dpi, timeout=10)
+                job['render_time'] = time.perf_counter() - started
+                return
+            except TimeoutError:
+                job['retries'] += 1
+                if job['retries'] >= MAX_RETRIES:
+                    raise
+
+    def extract_job(self, job):
+        """OCR stage: classify and extract, escalating the DPI when needed."""
+        if 'result' in job:
+            return
+
+        result = extract_pdf(job['pdf_path'], self.poppler_path, timeout=10, debug_path=job['debug_path'], image=job.pop('image'))
+        result['retries'] = job['retries']
+        result['exception'] = False
+        result['timings']['render'] += job['render_time']
+        store_cached_result(job['digest'], result)
+        job['result'] = result
+
+    def commit_job(self, job):
+        """Commit stage: log and move the file, or report why an earlier stage failed."""
+        error = job.get('error')
+        if error is not None:
+            job.pop('image', None)
+            error_message = "PDF to image conversion timed out." if isinstance(error, TimeoutError) else describe_error(error)
+            job['result'] = failed_result(job['pdf_path'], error_message, job['retries'])
+
+        self.commit(job['result'])
+        self.queue_depths.emit(self.pipeline.queue_depths())
+
+    def cancel_pending(self):
+        """Drop files that are still waiting, files already being moved finish first."""
+        for task in list(self.tasks.values()):
+            if self.thread_pool.tryTake(task):
+                self.tasks.pop(task.pdf_path, None)
+                self.drop_files([task.pdf_path])
+        for future in self.futures:
+            future.cancel()
+        if self.pipeline:
+            self.pipeline.stop()
+
     def on_task_completed(self, pdf_path, status):
         """Handle the completion of a single file."""
+        self.tasks.pop(pdf_path, None)
         self.completed.emit(pdf_path, status)
-        self.pending_tasks -= 1  # Decrement pending tasks counter
-        if self.pending_tasks == 0:  # If all tasks are complete
-            self.batch_completed.emit()
+        self.task_done()
+
+    def drop_files(self, pdf_paths):
+        """
+        Files stopped before they were committed: they stay in the data folder
+        and leave the journal, so the next start does not resume them.
+        """
+        journal = get_job_journal()
+        for pdf_path in pdf_paths:
+            journal.remove(pdf_path)
+        self.task_done(len(pdf_paths))
+
+    def task_done(self, count=1):
+        """Counted files are finished or were dropped, idle is emitted after the last one."""
+        with self.pending_lock:
+            self.pending_tasks -= count  # Decrement pending tasks counter
+            is_idle = self.pending_tasks == 0
+        if is_idle:
+            # the stages and pools stay up for the files that come next
+            self.idle.emit()
 
 
     def stop(self):
         """Stop the worker gracefully."""
         self._is_running = False
-        self.thread_pool.clear()
+        self.cancel_pending()
         self.progress.emit("Processing stopped.")
\ No newline at end of file
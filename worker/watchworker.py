@@ -0,0 +1,19 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+from utils.watcher import FolderWatcher
+
+
+class WatchWorker(QObject):
+    """Emits files_arrived on the GUI thread for files the FolderWatcher reports."""
+    files_arrived = pyqtSignal(list)
+
+    def __init__(self, data_folder):
+        super().__init__()
+        # the watcher calls back from its own thread, the signal is queued to the receiver's thread
+        self.watcher = FolderWatcher(data_folder, self.files_arrived.emit)
+
+    def start(self):
+        """Start watching, returns the mode used ('events' or 'poll')."""
+        return self.watcher.start()
+
+    def stop(self):
+        self.watcher.stop()